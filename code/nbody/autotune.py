@@ -0,0 +1,158 @@
+## Picks a solver (and Barnes–Hut theta) from a per-machine calibration profile
+##
+## calibrate() times one force evaluation of each solver on a few small random systems,
+## fits cost models (direct ~ c * N^2, Barnes–Hut ~ c(theta) * N log2 N) and measures the
+## Barnes–Hut force error for each theta and N against direct summation. The profile is
+## stored as JSON and reused until the machine fingerprint changes.
+
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from code.nbody.bodies import bodies_from_arrays
+from code.nbody.physics import SofteningConfig, compute_relative_force_errors
+from code.nbody.solvers.direct import DirectSolver
+from code.nbody.solvers.barneshut import BarnesHutSolver
+
+
+PROFILE_VERSION = 2
+DEFAULT_PROFILE_PATH = Path.home() / ".cache" / "nbody" / "calibration.json"
+
+CALIBRATION_NS = (64, 128, 256, 512)
+CALIBRATION_THETAS = (0.2, 0.3, 0.5, 0.7, 1.0)
+
+
+def machine_fingerprint() -> dict:
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def profile_path() -> Path:
+    return Path(os.environ.get("NBODY_CALIBRATION", DEFAULT_PROFILE_PATH))
+
+
+def _random_bodies(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1.0, 1.0, size=(n, 3))
+    vel = np.zeros((n, 3))
+    m = rng.uniform(1e-3, 1e-2, size=n)
+    return bodies_from_arrays(m, pos, vel)
+
+
+def _best_time(fn, repeats: int):
+    best = math.inf
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def calibrate(ns=CALIBRATION_NS, thetas=CALIBRATION_THETAS, softening: float = 1e-2,
+              repeats: int = 2, seed: int = 0) -> dict:
+    cfg = SofteningConfig(softening)
+    direct_coeffs = []
+    bh_coeffs = {theta: [] for theta in thetas}
+    bh_errors = {}
+    bh_p99 = {theta: [] for theta in thetas}
+
+    for n in ns:
+        bodies = _random_bodies(n, seed)
+        t_direct, ref = _best_time(lambda: DirectSolver().accelerations(bodies, cfg), repeats)
+        direct_coeffs.append(t_direct / (n * n))
+
+        for theta in thetas:
+            solver = BarnesHutSolver(theta=theta)
+            t_bh, acc = _best_time(lambda: solver.accelerations(bodies, cfg), repeats)
+            bh_coeffs[theta].append(t_bh / (n * math.log2(n)))
+            errors = compute_relative_force_errors(acc, ref)
+            bh_p99[theta].append(float(np.percentile(errors, 99)))
+            if n == max(ns):
+                bh_errors[theta] = {
+                    "median": float(np.median(errors)),
+                    "p99": float(np.percentile(errors, 99)),
+                    "max": float(errors.max()),
+                }
+
+    return {
+        "version": PROFILE_VERSION,
+        "machine": machine_fingerprint(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ns": list(ns),
+        "direct": {"coeff": statistics.median(direct_coeffs)},
+        "barneshut": {
+            str(theta): {
+                "coeff": statistics.median(bh_coeffs[theta]),
+                "error": bh_errors[theta],      # at the largest calibrated N
+                "p99_by_n": bh_p99[theta],      # one per profile["ns"]
+            }
+            for theta in thetas
+        },
+    }
+
+
+def load_profile(path: Path | None = None, recalibrate: bool = False) -> dict:
+    # cached profile for this machine, calibrating (and saving) first if needed
+    path = Path(path) if path is not None else profile_path()
+    if not recalibrate and path.exists():
+        try:
+            profile = json.loads(path.read_text(encoding="utf-8"))
+            if profile.get("version") == PROFILE_VERSION and profile.get("machine") == machine_fingerprint():
+                return profile
+        except (OSError, ValueError):
+            pass
+
+    profile = calibrate()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return profile
+
+
+def estimated_error(entry: dict, ns, n: int) -> float:
+    # p99 force error at n, interpolated in log2 N between the calibrated sizes;
+    # outside them the error at the nearest calibrated N is used
+    return float(np.interp(math.log2(n), np.log2(ns), entry["p99_by_n"]))
+
+
+def choose_solver(n: int, force_tol: float, profile: dict) -> dict:
+    """
+    Cheapest solver whose estimated 99th-percentile relative force error at n is
+    within force_tol (direct summation always qualifies, with zero error).
+    The error is interpolated over the calibrated sizes (profile["ns"], up to 512
+    by default) and held constant beyond them, so for much larger N it is an
+    extrapolation. Returns {"solver", "theta", "est_time", "est_error"}.
+    """
+    best = {
+        "solver": "direct",
+        "theta": None,
+        "est_time": profile["direct"]["coeff"] * n * n,
+        "est_error": 0.0,
+    }
+    if n < 2:
+        return best
+
+    for theta, entry in profile["barneshut"].items():
+        err = estimated_error(entry, profile["ns"], n)
+        if err > force_tol:
+            continue
+        est = entry["coeff"] * n * math.log2(n)
+        if est < best["est_time"]:
+            best = {"solver": "barneshut", "theta": float(theta), "est_time": est, "est_error": err}
+    return best
@@ -5,6 +5,8 @@
 from typing import List
 import math
 
+import numpy as np
+
 # Gravitational constant in AU^3 / (M_sun * yr^2)
 G = 4 * (math.pi)**2
 
@@ -32,6 +34,21 @@ class Body:
         return (self.m, self.x, self.y, self.z, self.vx, self.vy, self.vz)
 
 
+class Tracer(Body):
+    # massless test particle: feels gravity but is not a source of it.
+    # The solvers recognize tracers by m == 0, so this survives the integrators' Body copies.
+    def __init__(self, x, y, z=0.0, vx=0.0, vy=0.0, vz=0.0):
+        super().__init__(0.0, x, y, z, vx, vy, vz)
+
+
+def split_tracers(bodies: List[Body]):
+    # (indices of massive bodies, indices of tracers)
+    massive, tracers = [], []
+    for i, b in enumerate(bodies):
+        (tracers if b.m == 0.0 else massive).append(i)
+    return massive, tracers
+
+
 class SystemState:
 
     def __init__(self, bodies: List[Body], accel=None):
@@ -48,4 +65,17 @@ class SystemState:
         if self.accel is not None: 
             ax, ay, az = self.accel
             new_state.accel = (ax[:], ay[:], az[:])
-        return new_state
\ No newline at end of file
+        return new_state
+
+
+def bodies_to_arrays(bodies: List[Body]):
+    # (m, pos, vel) as float64 arrays of shape (N,), (N, 3), (N, 3)
+    data = np.array([b.asTuple() for b in bodies], dtype=np.float64).reshape(-1, 7)
+    return data[:, 0].copy(), data[:, 1:4].copy(), data[:, 4:7].copy()
+
+
+def bodies_from_arrays(m, pos, vel) -> List[Body]:
+    m = np.asarray(m, dtype=np.float64).tolist()
+    pos = np.asarray(pos, dtype=np.float64).tolist()
+    vel = np.asarray(vel, dtype=np.float64).tolist()
+    return [Body(mi, p[0], p[1], p[2], v[0], v[1], v[2]) for mi, p, v in zip(m, pos, vel)]
@@ -0,0 +1,166 @@
+## On-disk caches
+##
+## ResultCache: finished runs, keyed by sha256(run parameters + hash of the nbody sources),
+## so any code change invalidates old entries. Each entry is one .npz (final bodies, frames,
+## diagnostics and theta history, final Barnes-Hut theta); the cache is trimmed to max_bytes
+## by evicting the least recently used entries.
+##
+## SceneCache: generated initial conditions, one (N, 7) float64 .npy per scene + kwargs
+## (seed included), memory-mapped on load instead of regenerating.
+
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from code.nbody.bodies import Body, SystemState, bodies_from_arrays
+from code.nbody.checkpoint import DIAGNOSTIC_SERIES
+
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+
+# sources that decide what a scene generator returns
+SCENE_SOURCES = ("scenes.py", "bodies.py", "physics.py")
+
+
+@lru_cache(maxsize=None)
+def source_hash(names: tuple | None = None) -> str:
+    # hash of the given package files (all .py files when names is None)
+    paths = sorted(PACKAGE_DIR.rglob("*.py")) if names is None else [PACKAGE_DIR / n for n in names]
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(path.relative_to(PACKAGE_DIR).as_posix().encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def code_version() -> str:
+    return source_hash()
+
+
+def cache_key(params: dict) -> str:
+    payload = json.dumps({"params": params, "code": code_version()}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _atomic_savez(path: Path, arrays: dict):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _atomic_save(path: Path, array):
+    # pid in the temp name so concurrent sweep workers never share one
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+class ResultCache:
+    def __init__(self, root: str | Path = ".nbody_cache/results", max_bytes: int = 1 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.npz"
+
+    def load(self, key: str, sim) -> bool:
+        """
+        Fill sim (final state, frames, diagnostics series, final theta) from the cache.
+        Returns False on a miss; sim is left untouched in that case.
+        """
+        path = self.path_for(key)
+        try:
+            data = np.load(path)
+        except (FileNotFoundError, OSError, ValueError):
+            return False
+
+        with data:
+            sim.state = SystemState([Body(*row) for row in data["bodies"].tolist()])
+            sim.step_count = int(data["step_count"])
+
+            sizes = data["frame_sizes"]
+            flat = data["frames"]
+            bounds = np.concatenate(([0], np.cumsum(sizes)))
+            sim.frames = [flat[bounds[i]:bounds[i + 1]] for i in range(len(sizes))]
+
+            for name in DIAGNOSTIC_SERIES:
+                values = data[name].tolist()
+                setattr(sim, name, [tuple(v) if isinstance(v, list) else v for v in values])
+            sim.theta_history = [(int(step), theta, err) for step, theta, err in sim.theta_history]
+
+            # an adaptive-theta run ends on a different theta than it started with
+            if "theta" in data.files and hasattr(sim.solver, "theta"):
+                sim.solver.theta = float(data["theta"])
+
+        os.utime(path)  # mark as recently used
+        return True
+
+    def store(self, key: str, sim):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        frames = [np.asarray(f, dtype=np.float64).reshape(-1, 3) for f in sim.frames]
+        arrays = {
+            "bodies": np.array([b.asTuple() for b in sim.state.bodies], dtype=np.float64).reshape(-1, 7),
+            "step_count": np.array(sim.step_count),
+            "frame_sizes": np.array([len(f) for f in frames], dtype=np.int64),
+            "frames": np.concatenate(frames) if frames else np.empty((0, 3)),
+        }
+        for name in DIAGNOSTIC_SERIES:
+            arrays[name] = np.array(getattr(sim, name), dtype=np.float64)
+        if hasattr(sim.solver, "theta"):
+            arrays["theta"] = np.array(sim.solver.theta, dtype=np.float64)
+
+        _atomic_savez(self.path_for(key), arrays)
+        self.evict()
+
+    def entries(self):
+        # (path, size, last used) oldest first
+        out = []
+        for path in self.root.glob("*.npz"):
+            st = path.stat()
+            out.append((path, st.st_size, st.st_mtime))
+        out.sort(key=lambda e: e[2])
+        return out
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class SceneCache:
+    def __init__(self, root: str | Path = ".nbody_cache/scenes"):
+        self.root = Path(root)
+
+    def path_for(self, name: str, kwargs: dict) -> Path:
+        payload = json.dumps({"scene": name, "kwargs": kwargs, "code": source_hash(SCENE_SOURCES)}, sort_keys=True)
+        return self.root / f"{name}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]}.npy"
+
+    def load_arrays(self, name: str, kwargs: dict, generate, regen: bool = False):
+        """
+        (m, pos, vel) views of the cached (N, 7) array, memory-mapped read-only.
+        generate() must return a list of Body; it only runs on a miss or with regen=True.
+        """
+        path = self.path_for(name, kwargs)
+        if regen or not path.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            data = np.array([b.asTuple() for b in generate()], dtype=np.float64).reshape(-1, 7)
+            _atomic_save(path, data)
+        data = np.load(path, mmap_mode="r")
+        return data[:, 0], data[:, 1:4], data[:, 4:7]
+
+    def load(self, name: str, kwargs: dict, generate, regen: bool = False):
+        return bodies_from_arrays(*self.load_arrays(name, kwargs, generate, regen))
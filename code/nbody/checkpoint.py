@@ -0,0 +1,176 @@
+## Checkpoint / resume for long simulations
+##
+## A checkpoint is a single .npz file holding the integrator state (bodies + cached accel),
+## the diagnostics series, and a JSON blob with the step counter, diagnostics baselines,
+## config and the solver / integrator (and theta controller) needed to rebuild the Simulation,
+## plus the collision mergers so far.
+
+
+from __future__ import annotations
+
+import importlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from code.nbody.bodies import Body, SystemState
+
+
+FORMAT_VERSION = 1
+
+# baselines set by the engine on the first diagnostics update
+_BASELINES = ("E0", "E_scale", "L0", "P0", "com0", "L0_mag")
+
+DIAGNOSTIC_SERIES = (
+    "kinetic_history",
+    "potential_history",
+    "energy_history",
+    "energy_drift",
+    "angular_momentum_history",
+    "angular_momentum_drift",
+    "linear_momentum_history",
+    "linear_momentum_drift",
+    "com_history",
+    "com_drift",
+    "theta_history",
+)
+
+
+def _jsonable(values: dict) -> dict:
+    # keep plain scalars only (paths become strings, runtime objects are dropped)
+    out = {}
+    for k, v in values.items():
+        if k.startswith("_"):
+            continue
+        if isinstance(v, os.PathLike):
+            v = os.fspath(v)
+        if v is None or isinstance(v, (bool, int, float, str)):
+            out[k] = v
+    return out
+
+
+def _component_spec(obj) -> dict:
+    cls = type(obj)
+    return {"class": f"{cls.__module__}:{cls.__qualname__}", "params": _jsonable(vars(obj))}
+
+
+def _build_component(spec: dict):
+    module_name, qualname = spec["class"].split(":")
+    cls = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        cls = getattr(cls, part)
+    return cls(**spec["params"])
+
+
+def _controller_spec(controller) -> dict | None:
+    # parameters plus the sampling RNG and drift bookkeeping, so a resumed run adjusts theta identically
+    if controller is None:
+        return None
+    return {
+        **_component_spec(controller),
+        "rng": controller.rng.getstate(),
+        "last_drift": controller._last_drift,
+        "last_step": controller._last_step,
+    }
+
+
+def _build_controller(spec: dict | None):
+    if spec is None:
+        return None
+    controller = _build_component(spec)
+    version, internal, gauss = spec["rng"]
+    controller.rng.setstate((version, tuple(internal), gauss))
+    controller._last_drift = spec["last_drift"]
+    controller._last_step = spec["last_step"]
+    return controller
+
+
+def save_checkpoint(sim, path) -> Path:
+    """
+    Write sim's current state to path atomically (temp file + os.replace),
+    so a crash mid-write never leaves a truncated checkpoint behind.
+    """
+    path = Path(path)
+    state = sim.state
+
+    arrays = {
+        "bodies": np.array([b.asTuple() for b in state.bodies], dtype=np.float64).reshape(-1, 7),
+    }
+    if state.accel is not None:
+        arrays["accel"] = np.array(state.accel, dtype=np.float64)
+    for name in DIAGNOSTIC_SERIES:
+        arrays[name] = np.array(getattr(sim, name), dtype=np.float64)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "step": sim.step_count,
+        "config": _jsonable(vars(sim.cfg)),
+        "solver": _component_spec(sim.solver),
+        "integrator": _component_spec(sim.integrator),
+        "theta_controller": _controller_spec(sim.theta_controller),
+        "baselines": {k: getattr(sim, k) for k in _BASELINES if hasattr(sim, k)},
+        "metadata": sim.metadata,
+        "merge_events": sim.merge_events,
+    }
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path):
+    """
+    Rebuild a Simulation from a checkpoint; call sim.run(resume=True) to continue it.
+
+    In-memory frames and record_history snapshots are not stored, and the
+    trajectory file is not reopened (it would be overwritten), so frames are
+    only recorded again if the caller re-enables them.
+    """
+    from code.nbody.engine import Simulation, SimulationConfig
+
+    with np.load(Path(path)) as data:
+        meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {meta['version']}")
+
+        config = meta["config"]
+        cfg = SimulationConfig(dt=config["dt"], timesteps=config["timesteps"], softening=config["softening"])
+        for k, v in config.items():
+            setattr(cfg, k, v)
+        cfg.trajectory_path = None
+
+        bodies = [Body(*row) for row in data["bodies"].tolist()]
+        sim = Simulation(
+            bodies=bodies,
+            cfg=cfg,
+            integrator=_build_component(meta["integrator"]),
+            solver=_build_component(meta["solver"]),
+            theta_controller=_build_controller(meta.get("theta_controller")),
+        )
+
+        accel = None
+        if "accel" in data.files:
+            ax, ay, az = data["accel"].tolist()
+            accel = (ax, ay, az)
+        sim.state = SystemState(bodies, accel=accel)
+        sim.step_count = meta["step"]
+        sim.metadata = meta["metadata"]
+        sim.merge_events = meta.get("merge_events", [])
+
+        for k, v in meta["baselines"].items():
+            setattr(sim, k, tuple(v) if isinstance(v, list) else v)
+
+        for name in DIAGNOSTIC_SERIES:
+            if name not in data.files:
+                continue
+            values = data[name].tolist()
+            getattr(sim, name).extend(tuple(v) if isinstance(v, list) else v for v in values)
+
+    return sim
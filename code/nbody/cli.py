@@ -1,18 +1,38 @@
 from __future__ import annotations
 
 import argparse
+from pathlib import Path
 from typing import Optional, Sequence
 
-from code.nbody.viz import make_run_dir, save_stepc_outputs, animate_xy, animate_xyz, save_snapshots_xyz
+from code.nbody.viz import (
+    PROJECTIONS,
+    make_run_dir,
+    save_metadata_json,
+    save_stepc_outputs,
+    animate_xy,
+    animate_xyz,
+    animate_density,
+    save_snapshots_xyz,
+)
+from code.nbody.render import render_animation
 from code.nbody.engine import Simulation, SimulationConfig
+from code.nbody.trajectory import TrajectoryReader
+from code.nbody.checkpoint import load_checkpoint
+from code.nbody.sweep import expand_grid, run_sweep
+from code.nbody.cache import ResultCache, SceneCache, cache_key
+from code.nbody.loaders import FORMATS, load_arrays, parse_columns
+from code.nbody.bodies import bodies_from_arrays
+from code.nbody.autotune import load_profile, choose_solver
+from code.nbody.profiling import parse_window, profile_run
 from code.nbody.integrators.euler import EulerIntegrator
 from code.nbody.integrators.leapfrog import LeapfrogIntegrator
 from code.nbody.solvers.direct import DirectSolver
 from code.nbody.solvers.barneshut import BarnesHutSolver
+from code.nbody.solvers.adaptive import ThetaController
 from code.nbody import scenes
 
 
-SCENES = ("two_body", "three_body", "random_cluster", "disk", "benchmark_cluster")
+SCENES = ("two_body", "three_body", "random_cluster", "disk", "benchmark_cluster", "plummer", "hernquist", "king")
 SOLVERS = ("direct", "barneshut")
 INTEGRATORS = ("euler", "leapfrog")
 
@@ -22,14 +42,23 @@ SCENE_KWARGS = {
     "random_cluster": dict(n=500, seed=42, radius=3.0, mass_min=1e-3, mass_max=1e-2, v_scale=0.05),
     "disk": dict(n=300, seed=42, radius=5.0, mass=5e-2, v_scale=0.30, thickness=0.05),
     "benchmark_cluster": dict(n=2500, seed=123, radius=5.0, mass_min=1e-3, mass_max=1e-2, v_scale=0.06, virialize=True),
+    "plummer": dict(n=1000, seed=7, total_mass=1.0, scale_radius=1.0),
+    "hernquist": dict(n=1000, seed=7, total_mass=1.0, scale_radius=1.0),
+    "king": dict(n=1000, seed=7, total_mass=1.0, king_radius=1.0, W0=6.0),
 }
 
+# scenes that can add massless tracer particles (--tracers)
+TRACER_SCENES = ("disk",)
+
 RUN_PRESETS = {
     "two_body": dict(dt=0.002, steps=4000, softening=1e-3, frame_every=5, interval=30),
     "three_body": dict(dt=0.002, steps=6000, softening=1e-3, frame_every=5, interval=30),
     "random_cluster": dict(dt=0.001, steps=4000, softening=0.01, frame_every=25, interval=10),
     "disk": dict(dt=0.001, steps=5000, softening=0.002, frame_every=15, interval=10),
     "benchmark_cluster": dict(dt=0.001, steps=300, softening=0.01, frame_every=50, interval=10),
+    "plummer": dict(dt=0.002, steps=400, softening=0.02, frame_every=10, interval=20),
+    "hernquist": dict(dt=0.001, steps=400, softening=0.02, frame_every=10, interval=20),
+    "king": dict(dt=0.002, steps=400, softening=0.02, frame_every=10, interval=20),
 }
 
 
@@ -53,12 +82,23 @@ def check_steps(value: str) -> int:
     return ivalue
 
 
-def load_scene(name: str):
+def scene_kwargs(name: str, tracers: int = 0) -> dict:
+    kwargs = SCENE_KWARGS.get(name, {})
+    if tracers:
+        if name not in TRACER_SCENES:
+            raise ValueError(f"Scene '{name}' has no tracer option (supported: {', '.join(TRACER_SCENES)})")
+        kwargs = {**kwargs, "tracers": tracers}
+    return kwargs
+
+
+def load_scene(name: str, scene_cache: SceneCache | None = None, regen: bool = False, tracers: int = 0):
     if name not in SCENES:
         raise ValueError(f"Unknown scene '{name}'")
-    kwargs = SCENE_KWARGS.get(name, {})
+    kwargs = scene_kwargs(name, tracers)
     fn = getattr(scenes, name)
-    return fn(**kwargs)
+    if scene_cache is None:
+        return fn(**kwargs)
+    return scene_cache.load(name, kwargs, lambda: fn(**kwargs), regen=regen)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -84,19 +124,40 @@ def build_parser() -> argparse.ArgumentParser:
 
     scene_group = run_parser.add_argument_group("Scene selection")
     scene_group.add_argument("--scene", choices=SCENES, default="two_body")
+    scene_group.add_argument("--tracers", type=int, default=0)
+    scene_group.add_argument("--scene-file", default=None)
+    scene_group.add_argument("--file-format", choices=FORMATS, default=None)
+    scene_group.add_argument("--columns", default=None)
+    scene_group.add_argument("--length-unit", default="au")
+    scene_group.add_argument("--mass-unit", default="msun")
+    scene_group.add_argument("--velocity-unit", default="au/yr")
+    scene_group.add_argument("--delimiter", default=",")
+    scene_group.add_argument("--raw-columns", type=int, default=7)
+    scene_group.add_argument("--raw-dtype", default="<f8")
+    scene_group.add_argument("--raw-offset", type=int, default=0)
 
     method_group = run_parser.add_argument_group("Numerical methods")
-    method_group.add_argument("--solver", choices=SOLVERS, default="direct")
+    method_group.add_argument("--solver", choices=SOLVERS + ("auto",), default="direct")
     method_group.add_argument("--integrator", choices=INTEGRATORS, default="leapfrog")
     method_group.add_argument("--theta", type=float, default=0.7)
+    method_group.add_argument("--force-tol", type=float, default=1e-2)
+    method_group.add_argument("--recalibrate", action="store_true")
+    method_group.add_argument("--adaptive-theta", action="store_true")
+    method_group.add_argument("--theta-target", type=float, default=1e-2)
+    method_group.add_argument("--theta-max-drift", type=float, default=None)
+    method_group.add_argument("--theta-every", type=int, default=10)
 
     sim_group = run_parser.add_argument_group("Simulation parameters (optional overrides)")
     sim_group.add_argument("--dt", type=check_dt, default=None)
     sim_group.add_argument("--steps", type=check_steps, default=None)
     sim_group.add_argument("--softening", type=float, default=None)
+    sim_group.add_argument("--collision-radius", type=float, default=0.0)
+    sim_group.add_argument("--collision-every", type=check_steps, default=1)
 
     output_group = run_parser.add_argument_group("Diagnostics and output")
     output_group.add_argument("--energy", action="store_true")
+    output_group.add_argument("--async-diagnostics", action="store_true")
+    output_group.add_argument("--stats", action="store_true")
     output_group.add_argument("--plots", action="store_true")
     output_group.add_argument("--animate", action="store_true")
     output_group.add_argument("--frame-every", type=int, default=None)
@@ -104,10 +165,67 @@ def build_parser() -> argparse.ArgumentParser:
     output_group.add_argument("--save-gif", action="store_true")
     output_group.add_argument("--save-mp4", action="store_true")
     output_group.add_argument("--fps", type=int, default=30)
+    output_group.add_argument("--render-workers", type=int, default=None)
+    output_group.add_argument("--render-batch", type=int, default=16)
+    output_group.add_argument("--render-mode", choices=("scatter", "density"), default="scatter")
+    output_group.add_argument("--projection", choices=PROJECTIONS, default=None)
+    output_group.add_argument("--density-bins", type=int, default=512)
+    output_group.add_argument("--density-linear", action="store_true")
     output_group.add_argument("--no-show", action="store_true")
+    output_group.add_argument("--live", action="store_true")
     output_group.add_argument("--animate-3d", action="store_true")
-    output_group.add_argument("--max-3d-n", type=int, default=50)
+    output_group.add_argument("--max-3d-n", type=int, default=2000)
+    output_group.add_argument("--lod-density", type=float, default=0.0)
     output_group.add_argument("--snapshots", action="store_true")
+    output_group.add_argument("--trajectory", action="store_true")
+    output_group.add_argument("--trajectory-velocities", action="store_true")
+
+    cache_group = run_parser.add_argument_group("Result cache")
+    cache_group.add_argument("--no-cache", action="store_true")
+    cache_group.add_argument("--cache-dir", default=".nbody_cache")
+    cache_group.add_argument("--cache-max-mb", type=float, default=1024.0)
+    cache_group.add_argument("--regen", action="store_true")
+
+    profile_group = run_parser.add_argument_group("Profiling")
+    profile_group.add_argument("--profile", action="store_true")
+    profile_group.add_argument("--profile-steps", default=None)
+    profile_group.add_argument("--profile-interval", type=float, default=0.005)
+
+    checkpoint_group = run_parser.add_argument_group("Checkpointing")
+    checkpoint_group.add_argument("--checkpoint-every", type=int, default=0)
+    checkpoint_group.add_argument("--checkpoint-seconds", type=float, default=0.0)
+
+    resume_parser = subparsers.add_parser(
+        "resume",
+        help="Continue a run from a checkpoint file",
+        description="Continue a checkpointed run bit-identically up to its configured number of steps.",
+    )
+    resume_parser.add_argument("checkpoint")
+    resume_parser.add_argument("--steps", type=check_steps, default=None)
+    resume_parser.add_argument("--energy", action="store_true")
+    resume_parser.add_argument("--plots", action="store_true")
+
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Run a grid of configurations in parallel",
+        description=(
+            "Run every combination of scene x solver x integrator x theta x dt x softening "
+            "on a process pool and stream results to a CSV (.csv) or JSON-lines file. "
+            "dt, steps and softening default to each scene's run preset."
+        ),
+    )
+    sweep_parser.add_argument("--scenes", nargs="+", choices=SCENES, default=["random_cluster"])
+    sweep_parser.add_argument("--solvers", nargs="+", choices=SOLVERS, default=["barneshut"])
+    sweep_parser.add_argument("--integrators", nargs="+", choices=INTEGRATORS, default=["leapfrog"])
+    sweep_parser.add_argument("--thetas", nargs="+", type=float, default=[0.7])
+    sweep_parser.add_argument("--dts", nargs="+", type=check_dt, default=None)
+    sweep_parser.add_argument("--softenings", nargs="+", type=float, default=None)
+    sweep_parser.add_argument("--steps", type=check_steps, default=None)
+    sweep_parser.add_argument("--workers", type=int, default=None)
+    sweep_parser.add_argument("--timeout", type=float, default=None)
+    sweep_parser.add_argument("--out", required=True)
+    sweep_parser.add_argument("--skip-existing", action="store_true")
+    sweep_parser.add_argument("--cache-dir", default=".nbody_cache")
 
     subparsers.add_parser("list-scenes", help="List available scenes and their demo presets")
     return parser
@@ -146,7 +264,17 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
         return 0
 
     if args.command == "run":
-        preset = RUN_PRESETS.get(args.scene, {})
+        scene_name = Path(args.scene_file).stem if args.scene_file else args.scene
+        preset = {} if args.scene_file else RUN_PRESETS.get(args.scene, {})
+
+        try:
+            profile_window = parse_window(args.profile_steps)
+        except ValueError as e:
+            parser.error(f"--profile-steps: {e}")
+        if args.profile and args.live:
+            parser.error("--profile cannot be combined with --live")
+        if profile_window is not None and not args.profile:
+            parser.error("--profile-steps needs --profile")
 
         if args.dt is None:
             args.dt = preset.get("dt", 0.002)
@@ -158,38 +286,157 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             args.frame_every = preset.get("frame_every", 5)
         if args.interval is None:
             args.interval = preset.get("interval", 30)
-
-        bodies = load_scene(args.scene)
+        if profile_window is not None and profile_window[0] > args.steps:
+            parser.error(f"--profile-steps: window starts at step {profile_window[0]}, but the run has {args.steps} steps")
+
+        if args.scene_file:
+            try:
+                file_options = dict(
+                    fmt=args.file_format,
+                    columns=parse_columns(args.columns),
+                    length_unit=args.length_unit,
+                    mass_unit=args.mass_unit,
+                    velocity_unit=args.velocity_unit,
+                    delimiter=args.delimiter,
+                    raw_columns=args.raw_columns,
+                    raw_dtype=args.raw_dtype,
+                    raw_offset=args.raw_offset,
+                )
+                bodies = bodies_from_arrays(*load_arrays(args.scene_file, **file_options))
+            except (OSError, ValueError) as e:
+                parser.error(f"--scene-file: {e}")
+        else:
+            try:
+                scene_kwargs(args.scene, args.tracers)
+            except ValueError as e:
+                parser.error(f"--tracers: {e}")
+            try:
+                bodies = load_scene(args.scene, SceneCache(Path(args.cache_dir) / "scenes"), regen=args.regen, tracers=args.tracers)
+            except ValueError as e:
+                parser.error(f"--scene: {e}")
+        N = len(bodies)
+
+        if args.solver == "auto":
+            choice = choose_solver(N, args.force_tol, load_profile(recalibrate=args.recalibrate))
+            args.solver = choice["solver"]
+            if choice["theta"] is not None:
+                args.theta = choice["theta"]
+            theta_note = f" theta={args.theta}" if args.solver == "barneshut" else ""
+            print(
+                f"Auto solver: {args.solver}{theta_note} "
+                f"(est. {1e3 * choice['est_time']:.2f} ms/eval, p99 force error {choice['est_error']:.1e})"
+            )
+
+        if args.adaptive_theta and args.solver != "barneshut":
+            parser.error(f"--adaptive-theta needs the barneshut solver (got {args.solver})")
 
         cfg = SimulationConfig(dt=args.dt, timesteps=args.steps, softening=args.softening)
-        cfg.enable_diagnostics = args.energy or args.plots
+        # the drift budget of --adaptive-theta is checked against the energy diagnostics
+        drift_budget = args.adaptive_theta and args.theta_max_drift is not None
+        cfg.enable_diagnostics = args.energy or args.plots or drift_budget
+        cfg.async_diagnostics = args.async_diagnostics
+        cfg.collect_stats = args.stats
+        cfg.collision_radius = args.collision_radius
+        cfg.collision_every = args.collision_every
 
         needs_frames = args.animate or args.animate_3d or args.snapshots
-        cfg.record_frames = needs_frames
+        cfg.record_frames = needs_frames and not args.trajectory
         cfg.frame_every = args.frame_every
 
-        sim = Simulation(
-            bodies=bodies,
-            cfg=cfg,
-            integrator=make_integrator(args.integrator),
-            solver=make_solver(args.solver, args.theta),
-        )
-
-        sim.run()
-
-        N = len(sim.state.bodies)
-        title_prefix = f"{args.scene} | {args.solver} | {args.integrator} | N={N}"
+        title_prefix = f"{scene_name} | {args.solver} | {args.integrator} | N={N}"
 
         want_3d = args.animate_3d
-        small_enough = N <= args.max_3d_n
-        fallback_to_snapshots = want_3d and not small_enough
+        density = args.render_mode == "density"
 
         saving_anim = (args.animate or args.animate_3d) and (args.save_gif or args.save_mp4)
-        needs_run_dir = args.plots or saving_anim or args.snapshots or fallback_to_snapshots
+        checkpointing = args.checkpoint_every > 0 or args.checkpoint_seconds > 0
+        needs_run_dir = (
+            args.plots or saving_anim or args.snapshots or args.trajectory or checkpointing or args.profile
+            or args.collision_radius > 0
+        )
 
         run_dir = None
         if needs_run_dir:
-            run_dir = make_run_dir("outputs", args.scene, args.solver, args.integrator, N)
+            run_dir = make_run_dir("outputs", scene_name, args.solver, args.integrator, N)
+
+        if args.trajectory:
+            cfg.trajectory_path = run_dir / "trajectory.nbt"
+            cfg.trajectory_velocities = args.trajectory_velocities
+
+        if checkpointing:
+            cfg.checkpoint_path = run_dir / "checkpoint.npz"
+            cfg.checkpoint_every = args.checkpoint_every
+            cfg.checkpoint_seconds = args.checkpoint_seconds
+
+        theta_controller = None
+        if args.adaptive_theta:
+            theta_controller = ThetaController(
+                target_error=args.theta_target,
+                max_energy_drift=args.theta_max_drift,
+                every=args.theta_every,
+            )
+
+        sim = Simulation(
+            bodies=bodies,
+            cfg=cfg,
+            integrator=make_integrator(args.integrator),
+            solver=make_solver(args.solver, args.theta),
+            theta_controller=theta_controller,
+        )
+        sim.metadata = {"scene": scene_name}
+
+        # runs that write side outputs or measure themselves always execute
+        use_cache = not (
+            args.no_cache or args.trajectory or checkpointing or args.stats or args.live or args.profile
+            or args.collision_radius > 0
+        )
+        if use_cache:
+            cache = ResultCache(Path(args.cache_dir) / "results", max_bytes=int(args.cache_max_mb * 1024 * 1024))
+            if args.scene_file:
+                st = Path(args.scene_file).stat()
+                scene_key = {
+                    "file": str(Path(args.scene_file).resolve()),
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "options": file_options,
+                }
+            else:
+                scene_key = {"scene": args.scene, "scene_kwargs": scene_kwargs(args.scene, args.tracers)}
+            key = cache_key({
+                **scene_key,
+                "dt": args.dt,
+                "steps": args.steps,
+                "softening": args.softening,
+                "frame_every": args.frame_every,
+                "solver": args.solver,
+                "theta": args.theta if args.solver == "barneshut" else None,
+                "adaptive_theta": None if theta_controller is None else [args.theta_target, args.theta_max_drift, args.theta_every],
+                "integrator": args.integrator,
+                "record_frames": cfg.record_frames,
+                "enable_diagnostics": cfg.enable_diagnostics,
+            })
+            if cache.load(key, sim):
+                print(f"Loaded cached result {key[:12]} (use --no-cache to recompute)")
+            else:
+                sim.run()
+                cache.store(key, sim)
+        elif args.profile:
+            # only the simulation is profiled, plotting and rendering below are not
+            profiled = profile_run(sim, run_dir, window=profile_window, sample_interval=args.profile_interval)
+        elif args.live:
+            sim.show(every=args.frame_every, interval=args.interval)
+            if sim.step_count < args.steps:
+                print(f"Live view closed at step {sim.step_count} of {args.steps}")
+        else:
+            sim.run()
+
+        frames = sim.frames
+        if args.trajectory:
+            frames = TrajectoryReader(cfg.trajectory_path)
+            print(f"\nTrajectory saved to: {cfg.trajectory_path} ({len(frames)} frames)")
+
+        if args.collision_radius > 0:
+            save_metadata_json(sim.merge_events, run_dir / "merges.json")
 
         if args.plots:
             saved_files = save_stepc_outputs(sim, run_dir, title_prefix=title_prefix)
@@ -197,39 +444,158 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             for path in saved_files:
                 print(f"  - {path.name}")
 
-        if args.snapshots or fallback_to_snapshots:
-            if fallback_to_snapshots:
-                print(f"\n3D animation disabled (N={N} > {args.max_3d_n}). Saving 3D snapshots instead.")
-            saved = save_snapshots_xyz(sim, run_dir, title_prefix=title_prefix)
+        if args.snapshots:
+            saved = save_snapshots_xyz(sim, run_dir, title_prefix=title_prefix, frames=frames)
             print(f"3D snapshots saved to: {run_dir}")
             for p in saved:
                 print(f"  - {p.name}")
 
+        render_options = dict(title=title_prefix, fps=args.fps, batch_size=args.render_batch, workers=args.render_workers)
+        density_options = dict(bins=args.density_bins, log=not args.density_linear)
+
         if args.animate:
-            out_path = None
+            projection = args.projection or "xy"
             if saving_anim:
                 out_path = run_dir / ("anim_xy.gif" if args.save_gif else "anim_xy.mp4")
-            saved = animate_xy(sim.frames, out_path=out_path, interval=args.interval, title=title_prefix, show=(not args.no_show), fps=args.fps)
-            if saved is not None:
+                if density:
+                    saved = render_animation(frames, out_path, mode="density", projection=projection, **render_options, **density_options)
+                else:
+                    saved = render_animation(frames, out_path, mode="xy", **render_options)
                 print(f"Animation saved to: {saved}")
-
-        if want_3d and small_enough:
-            out_path = None
+            if not args.no_show:
+                if density:
+                    animate_density(frames, projection, interval=args.interval, title=title_prefix, **density_options)
+                else:
+                    animate_xy(frames, interval=args.interval, title=title_prefix, show=True)
+
+        if want_3d:
+            projection = args.projection or "3d"
+            # large runs draw a fixed mass-weighted subset of at most --max-3d-n bodies,
+            # chosen on the first frame (the initial bodies) and followed through mergers
+            lod_options = dict(
+                max_points=args.max_3d_n, masses=[b.m for b in bodies], density_weight=args.lod_density,
+                merge_events=sim.merge_events,
+            )
+            if N > args.max_3d_n and not density:
+                print(f"\n3D animation: drawing {args.max_3d_n} of {N} bodies")
             if saving_anim:
                 out_path = run_dir / ("anim_xyz.gif" if args.save_gif else "anim_xyz.mp4")
-            saved = animate_xyz(sim.frames, out_path=out_path, interval=args.interval, title=title_prefix, show=(not args.no_show), fps=args.fps)
-            if saved is not None:
+                if density:
+                    saved = render_animation(frames, out_path, mode="density", projection=projection, **render_options, **density_options)
+                else:
+                    saved = render_animation(frames, out_path, mode="xyz", **render_options, **lod_options)
                 print(f"3D animation saved to: {saved}")
+            if not args.no_show:
+                if density:
+                    animate_density(frames, projection, interval=args.interval, title=title_prefix, **density_options)
+                else:
+                    animate_xyz(frames, interval=args.interval, title=title_prefix, show=True, **lod_options)
 
         print("\nSimulation complete")
-        print(f"Scene:       {args.scene}")
+        print(f"Scene:       {scene_name}")
         print(f"Solver:      {args.solver}")
         print(f"Integrator:  {args.integrator}")
         print(f"Bodies:      {N}")
+        n_tracers = sum(1 for b in bodies if b.m == 0.0)
+        if n_tracers:
+            print(f"Tracers:     {n_tracers} (massless)")
         print(f"Steps:       {args.steps}")
         print(f"dt:          {args.dt}")
         print(f"softening:   {args.softening}")
 
+        if args.energy and sim.energy_history:
+            print(f"Final energy: {sim.energy_history[-1]:.6e}")
+
+        if checkpointing:
+            print(f"Checkpoint:  {cfg.checkpoint_path}")
+
+        if args.collision_radius > 0:
+            absorbed = sum(len(e["members"]) - 1 for e in sim.merge_events)
+            print(f"Mergers:     {len(sim.merge_events)} ({absorbed} bodies absorbed, {len(sim.state.bodies)} left)")
+            print(f"Merge log:   {run_dir / 'merges.json'}")
+
+        if sim.theta_history:
+            thetas = [h[1] for h in sim.theta_history]
+            print(f"Theta:       {min(thetas):.3f} .. {max(thetas):.3f} (last {thetas[-1]:.3f})")
+
+        if sim.stats is not None:
+            print()
+            print(sim.stats.report())
+
+        if args.profile:
+            print()
+            print(profiled["summary"])
+            if profiled["pstats"] is not None:
+                print(f"Profile:     {profiled['pstats']}")
+            print(f"Stacks:      {profiled['collapsed']} ({profiled['samples']} samples)")
+
+        return 0
+
+    if args.command == "sweep":
+        jobs = []
+        for scene in args.scenes:
+            preset = RUN_PRESETS.get(scene, {})
+            jobs += expand_grid(
+                [scene],
+                args.solvers,
+                args.integrators,
+                args.thetas,
+                args.dts or [preset.get("dt", 0.002)],
+                args.softenings or [preset.get("softening", 1e-3)],
+                args.steps or preset.get("steps", 2000),
+            )
+        for job in jobs:
+            job["cache_dir"] = args.cache_dir
+
+        print(f"Sweep: {len(jobs)} jobs -> {args.out}")
+
+        def report(row):
+            theta = "" if row["theta"] is None else f" theta={row['theta']}"
+            line = f"  [{row['status']}] {row['scene']} {row['solver']}{theta} {row['integrator']} dt={row['dt']} soft={row['softening']}"
+            if row["status"] == "ok":
+                line += f"  {row['runtime']:.3f} s  max dE={row['max_energy_drift']:.2e}"
+            elif row.get("error"):
+                line += f"  {row['error']}"
+            print(line, flush=True)
+
+        results = run_sweep(
+            jobs,
+            args.out,
+            workers=args.workers,
+            timeout=args.timeout,
+            skip_existing=args.skip_existing,
+            on_result=report,
+        )
+        skipped = len(jobs) - len(results)
+        print(f"\nSweep complete: {len(results)} run, {skipped} skipped")
+        return 0
+
+    if args.command == "resume":
+        sim = load_checkpoint(args.checkpoint)
+        if args.steps is not None:
+            sim.cfg.timesteps = args.steps
+        sim.cfg.record_frames = False
+
+        start = sim.step_count
+        sim.run(resume=True)
+
+        scene = sim.metadata.get("scene", "?")
+        N = len(sim.state.bodies)
+        if args.plots:
+            run_dir = Path(args.checkpoint).parent
+            title_prefix = f"{scene} | {type(sim.solver).__name__} | {type(sim.integrator).__name__} | N={N}"
+            saved_files = save_stepc_outputs(sim, run_dir, title_prefix=title_prefix)
+            print(f"\nPlots saved to: {run_dir}")
+            for path in saved_files:
+                print(f"  - {path.name}")
+
+        print("\nResumed simulation complete")
+        print(f"Scene:       {scene}")
+        print(f"Solver:      {type(sim.solver).__name__}")
+        print(f"Integrator:  {type(sim.integrator).__name__}")
+        print(f"Bodies:      {N}")
+        print(f"Steps:       {start} -> {sim.step_count}")
+
         if args.energy and sim.energy_history:
             print(f"Final energy: {sim.energy_history[-1]:.6e}")
 
@@ -0,0 +1,145 @@
+## Collision detection and inelastic merging
+##
+## Candidate pairs come from a uniform hash grid with cells one collision radius
+## wide, so a body is only compared with the bodies in its own and the 26 adjacent
+## cells (about O(N) for a spread-out system instead of the O(N^2) all-pairs scan).
+## Touching pairs are grouped with union-find, so chains (a-b, b-c) become a single
+## merger. The merged body has the group's total mass, linear momentum and centre of
+## mass. Tracers (m == 0) never collide.
+
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from itertools import product
+from typing import List
+
+from code.nbody.bodies import Body
+
+
+# half of the 26 neighbour offsets: every pair of adjacent cells is visited once
+_HALF_OFFSETS = [o for o in product((-1, 0, 1), repeat=3) if o > (0, 0, 0)]
+
+
+def find_close_pairs(points, radius: float) -> list[tuple[int, int]]:
+    # (i, j), i < j, for all points (sequence of (x, y, z)) closer than radius
+    inv = 1.0 / radius
+    r2 = radius * radius
+    floor = math.floor
+    grid = {}
+    for i, (x, y, z) in enumerate(points):
+        grid.setdefault((floor(x * inv), floor(y * inv), floor(z * inv)), []).append(i)
+
+    pairs = []
+
+    def check(i, j):
+        xi, yi, zi = points[i]
+        xj, yj, zj = points[j]
+        dx, dy, dz = xj - xi, yj - yi, zj - zi
+        if dx * dx + dy * dy + dz * dz < r2:
+            pairs.append((i, j) if i < j else (j, i))
+
+    for (cx, cy, cz), members in grid.items():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                check(members[a], members[b])
+        for ox, oy, oz in _HALF_OFFSETS:
+            other = grid.get((cx + ox, cy + oy, cz + oz))
+            if other is not None:
+                for i in members:
+                    for j in other:
+                        check(i, j)
+    return pairs
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # path halving
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # the lower index becomes the root, so a group is named by its first body
+            if rj < ri:
+                ri, rj = rj, ri
+            self.parent[rj] = ri
+
+
+def merge_groups(pairs, n: int) -> list[list[int]]:
+    # connected components with more than one member, each sorted, ordered by first index
+    uf = UnionFind(n)
+    for i, j in pairs:
+        uf.union(i, j)
+    groups = {}
+    for i in sorted({k for pair in pairs for k in pair}):
+        groups.setdefault(uf.find(i), []).append(i)
+    return [groups[root] for root in sorted(groups)]
+
+
+def merge_bodies(group: List[Body]) -> Body:
+    m = sum(b.m for b in group)
+    x = sum(b.m * b.x for b in group) / m
+    y = sum(b.m * b.y for b in group) / m
+    z = sum(b.m * b.z for b in group) / m
+    vx = sum(b.m * b.vx for b in group) / m
+    vy = sum(b.m * b.vy for b in group) / m
+    vz = sum(b.m * b.vz for b in group) / m
+    return Body(m, x, y, z, vx, vy, vz)
+
+
+def merge_collisions(bodies: List[Body], radius: float):
+    """
+    Merge every group of massive bodies that are closer than radius.
+
+    Returns (bodies, events). The merged body takes the place of the group's first
+    member and the other members are dropped in the same pass; bodies is returned
+    unchanged when nothing merged. Each event records the members' indices in the
+    input list, their masses and the merged body.
+    """
+    massive = [i for i, b in enumerate(bodies) if b.m != 0.0]
+    points = [(bodies[i].x, bodies[i].y, bodies[i].z) for i in massive]
+    pairs = find_close_pairs(points, radius)
+    if not pairs:
+        return bodies, []
+
+    replaced = {}
+    events = []
+    for group in merge_groups(pairs, len(points)):
+        members = [massive[k] for k in group]
+        merged = merge_bodies([bodies[i] for i in members])
+        replaced[members[0]] = merged
+        for i in members[1:]:
+            replaced[i] = None
+        events.append({
+            "members": members,
+            "masses": [bodies[i].m for i in members],
+            "merged": merged.asTuple(),
+        })
+
+    out = []
+    for i, b in enumerate(bodies):
+        if i in replaced:
+            b = replaced[i]
+            if b is None:
+                continue
+        out.append(b)
+    return out, events
+
+
+def remap_indices(indices, events) -> list[int]:
+    """
+    Where the bodies at `indices` (in the list before one merge_collisions pass) sit
+    in the list after it, sorted and without repeats: every member of a group maps to
+    the merged body, which keeps the first member's index.
+    """
+    absorbed = sorted(i for e in events for i in e["members"][1:])
+    into = {i: e["members"][0] for e in events for i in e["members"][1:]}
+    return sorted({into.get(i, i) - bisect_left(absorbed, into.get(i, i)) for i in indices})
@@ -0,0 +1,57 @@
+## Runs diagnostics on a background thread so the stepping loop does not wait for them
+##
+## The engine hands over read-only (m, pos, vel) snapshots through a bounded queue;
+## a single worker measures and records them in submission order, so the resulting
+## series are identical to the synchronous path.
+
+
+import queue
+import threading
+
+
+_STOP = object()
+
+
+class DiagnosticsWorker:
+    def __init__(self, measure, record, maxsize: int = 8):
+        # measure(snapshot) -> values, record(values, is_initial) appends to the histories
+        self.measure = measure
+        self.record = record
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._loop, name="nbody-diagnostics", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._error is None:
+                    snapshot, is_initial = item
+                    self.record(self.measure(snapshot), is_initial)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_pending(self):
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise err
+
+    def submit(self, snapshot, is_initial: bool = False):
+        # only blocks if the worker is a full queue behind
+        self._raise_pending()
+        self._queue.put((snapshot, is_initial))
+
+    def drain(self):
+        # wait until everything submitted so far has been recorded
+        self._queue.join()
+        self._raise_pending()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_pending()
@@ -1,18 +1,22 @@
 import math
+import time
 from typing import List
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 
-from code.nbody.bodies import Body, SystemState
+from code.nbody.bodies import Body, SystemState, bodies_to_arrays
+from code.nbody.trajectory import TrajectoryWriter
+from code.nbody.checkpoint import save_checkpoint
+from code.nbody.collisions import merge_collisions
+from code.nbody.diagnostics import DiagnosticsWorker
+from code.nbody.stats import SimulationStats, timed
 from code.nbody.integrators.euler import EulerIntegrator
 from code.nbody.solvers.direct import DirectSolver
 from code.nbody.solvers.barneshut import BarnesHutSolver
 from code.nbody.physics import (
-    compute_kinetic_energy,
-    compute_potential_energy,
-    compute_angular_momentum,
-    compute_linear_momentum,
-    compute_center_of_mass,
+    compute_kinetic_energy_arrays,
+    compute_potential_energy_arrays,
+    compute_angular_momentum_arrays,
+    compute_linear_momentum_arrays,
+    compute_center_of_mass_arrays,
 )
 
 
@@ -28,13 +32,62 @@ class SimulationConfig:
         self.record_frames: bool = False
         self.frame_every : int = 1
 
+        # measure diagnostics on a background thread (bounded queue of snapshots)
+        self.async_diagnostics: bool = False
+        self.diagnostics_queue_size: int = 8
+
+        # binary trajectory file written during run() (same cadence as frames)
+        self.trajectory_path = None
+        self.trajectory_velocities: bool = False
+        self.trajectory_chunk_frames: int = 64
+
+        # periodic checkpoints (every N steps and/or every T wall-clock seconds, 0 = off)
+        self.checkpoint_path = None
+        self.checkpoint_every: int = 0
+        self.checkpoint_seconds: float = 0.0
+
+        # inelastic mergers of massive bodies closer than collision_radius (0 = off),
+        # checked every collision_every steps; events are kept in Simulation.merge_events
+        self.collision_radius: float = 0.0
+        self.collision_every: int = 1
+
+        # per-phase timings / interaction counters; the engine publishes the live
+        # SimulationStats object as cfg.stats so solvers and integrators can add to it
+        self.collect_stats: bool = False
+        self.stats = None
+
+
+class StepView:
+    """
+    Lightweight per-step view handed out by Simulation.iter_steps().
+
+    state is the integrator's internal state (for leapfrog, velocities are at the
+    half step); synced has positions and velocities at the same time level.
+    Both are the live objects, so copy them if you need to keep them around.
+    """
+    __slots__ = ("step", "time", "state", "synced")
+
+    def __init__(self, step, time, state, synced):
+        self.step = step
+        self.time = time
+        self.state = state
+        self.synced = synced
+
+    @property
+    def bodies(self):
+        return self.synced.bodies
+
+    def positions(self):
+        return [(b.x, b.y, b.z) for b in self.synced.bodies]
+
 
 class Simulation:
-    def __init__(self, bodies: List[Body], cfg: SimulationConfig, integrator=None, solver=None):
+    def __init__(self, bodies: List[Body], cfg: SimulationConfig, integrator=None, solver=None, theta_controller=None):
         self.state = SystemState(bodies)
         self.cfg = cfg
         self.integrator = integrator or EulerIntegrator()
         self.solver = solver or DirectSolver() or BarnesHutSolver()
+        self.theta_controller = theta_controller  # e.g. solvers.adaptive.ThetaController (Barnes–Hut only)
 
         self.state_history = []
 
@@ -51,80 +104,250 @@ class Simulation:
 
         self.com_history = []
         self.com_drift = []
+
+        self.theta_history = []  # (step, theta, sampled force error) from the theta controller
+        self.merge_events = []   # dicts from collisions.merge_collisions plus step and time
         
         self.frames = []
+        self.trajectory = None
+        self._diagnostics_worker = None
 
+        self.step_count = 0
+        self.stats = None
+        self.metadata = {}  # free-form run info carried into trajectory headers and checkpoints
 
-    def run(self):
-        self._clear_histories()
-        accel_fn = self._initialize_simulation()
 
-        pss = None
-        if self.cfg.record_history:
-            pss = []
-            pss.append([(b.x, b.y, b.z) for b in self.state.bodies])
-
-        for step in range(self.cfg.timesteps):
-            self._step(accel_fn, step)
+    def run(self, resume: bool = False):
+        # resume=True continues from self.step_count (e.g. after load_checkpoint) without re-initializing
+        pss = [] if self.cfg.record_history else None
+        for view in self.iter_steps(resume=resume):
             if pss is not None:
-                pss.append([(b.x, b.y, b.z) for b in self.state.bodies])
-
+                pss.append([(b.x, b.y, b.z) for b in view.state.bodies])
         return pss
+
+
+    def run_until(self, t: float, stop_when=None, resume: bool = False):
+        # advance until simulated time t (ignores cfg.timesteps); returns the last StepView
+        view = None
+        for view in self.iter_steps(until=t, stop_when=stop_when, resume=resume):
+            pass
+        return view
+
+
+    def iter_steps(self, every: int = 1, until: float | None = None, stop_when=None, resume: bool = False):
+        """
+        Generator version of run(): yields a StepView after every `every` steps,
+        after the last step, and once for the initial state unless resuming.
+
+        until:     stop at simulated time t instead of after cfg.timesteps
+        stop_when: predicate on StepView, checked every step; the run stops
+                   after the first view for which it returns True (that view is yielded)
+
+        Views reference the live state objects, nothing is copied. Closing the
+        generator early still flushes the trajectory and diagnostics worker.
+        """
+        if every <= 0:
+            raise ValueError("every must be a positive integer")
+
+        if resume:
+            accel_fn = self._make_accel_fn()
+        else:
+            self._clear_histories()
+            self.step_count = 0
+        self.stats = SimulationStats() if self.cfg.collect_stats else None
+        self.cfg.stats = self.stats
+
+        last_step = self.cfg.timesteps
+        if until is not None:
+            last_step = math.ceil(until / self.cfg.dt - 1e-9)
+
+        t_start = time.perf_counter()
+        self._open_trajectory()
+        self._start_diagnostics_worker()
+        self._last_checkpoint_time = time.perf_counter()
+        try:
+            if not resume:
+                accel_fn, diag = self._initialize_simulation()
+                view = StepView(0, 0.0, self.state, diag)
+                yield view
+                if stop_when is not None and stop_when(view):
+                    return
+
+            for step in range(self.step_count, last_step):
+                diag = self._step(accel_fn, step)
+                view = StepView(step + 1, (step + 1) * self.cfg.dt, self.state, diag)
+                stop = stop_when is not None and stop_when(view)
+                if stop or (step + 1) % every == 0 or step + 1 == last_step:
+                    yield view
+                if stop:
+                    return
+        finally:
+            self._close_trajectory()
+            self._stop_diagnostics_worker()
+            self.solver.close()  # worker processes, if any; a later run starts them again
+            if self.stats is not None:
+                self.stats.wall_time = time.perf_counter() - t_start
+
+
+    def _start_diagnostics_worker(self):
+        if self.cfg.enable_diagnostics and self.cfg.async_diagnostics:
+            self._diagnostics_worker = DiagnosticsWorker(
+                self._measure_diagnostics,
+                self._record_diagnostics,
+                maxsize=self.cfg.diagnostics_queue_size,
+            )
+
+
+    def _stop_diagnostics_worker(self):
+        if self._diagnostics_worker is not None:
+            worker, self._diagnostics_worker = self._diagnostics_worker, None
+            worker.close()
+
+
+    def _open_trajectory(self):
+        if self.cfg.trajectory_path is None:
+            return
+        metadata = {
+            "n_bodies": len(self.state.bodies),
+            "dt": self.cfg.dt,
+            "timesteps": self.cfg.timesteps,
+            "softening": self.cfg.softening,
+            "frame_every": self.cfg.frame_every,
+            "solver": type(self.solver).__name__,
+            "integrator": type(self.integrator).__name__,
+            **self.metadata,
+        }
+        self.trajectory = TrajectoryWriter(
+            self.cfg.trajectory_path,
+            metadata=metadata,
+            velocities=self.cfg.trajectory_velocities,
+            chunk_frames=self.cfg.trajectory_chunk_frames,
+        )
+
+
+    def _close_trajectory(self):
+        if self.trajectory is not None:
+            self.trajectory.close()
+            self.trajectory = None
+
+
+    def _record_frame(self, diag, step):
+        if self.cfg.record_frames:
+            self.frames.append([(b.x, b.y, b.z) for b in diag.bodies])
+        if self.trajectory is not None:
+            self.trajectory.append(diag.bodies, step)
     
 
-    def _initialize_simulation(self):
+    def _make_accel_fn(self):
         def accel_fn(bodies):
             return self.solver.accelerations(bodies, self.cfg)
+        return accel_fn
+
+
+    def _initialize_simulation(self):
+        accel_fn = self._make_accel_fn()
 
         self.state = self.integrator.initialize(self.state, self.cfg, accel_fn) #prepares for leapfrog (correct for integrating but not for measuring)
-        diag = self.integrator.synchronize(self.state, self.cfg, accel_fn) #this is actually never integrated, only for measuring
+        with timed(self.stats, "synchronize"):
+            diag = self.integrator.synchronize(self.state, self.cfg, accel_fn) #this is actually never integrated, only for measuring
 
         if self.cfg.record_history:
             self.state_history.append(diag.copy()) #stores diagnostics
 
-        if self.cfg.record_frames:
-            self.frames.append([(b.x, b.y, b.z) for b in diag.bodies])
+        with timed(self.stats, "frame_recording"):
+            self._record_frame(diag, 0)
 
         if self.cfg.enable_diagnostics:
-            K0 = compute_kinetic_energy(diag.bodies)
-            U0 = compute_potential_energy(diag.bodies, self.cfg)
-            E0 = K0 + U0
-            L0 = compute_angular_momentum(diag.bodies)
-            P0 = compute_linear_momentum(diag.bodies)
-            x_cm0, y_cm0, z_cm0 = compute_center_of_mass(diag.bodies)
-            L0_mag = math.sqrt(L0[0]**2 + L0[1]**2 + L0[2]**2)
-
-            self.E0 = E0
-            self.L0 = L0
-            self.P0 = P0
-            self.com0 = (x_cm0, y_cm0, z_cm0)
-            self.L0_mag = L0_mag
-
-            self._update_diagnostics(diag, is_initial=True)
-        return accel_fn
+            with timed(self.stats, "diagnostics"):
+                self._update_diagnostics(diag, is_initial=True)
+        return accel_fn, diag
     
 
     def _step(self, accel_fn, step):
         self.state = self.integrator.step(self.state, self.cfg, accel_fn)
-        diag = self.integrator.synchronize(self.state, self.cfg, accel_fn)
+        if self.cfg.collision_radius > 0 and (step + 1) % self.cfg.collision_every == 0:
+            with timed(self.stats, "collisions"):
+                self._merge_collisions(step + 1)
+        with timed(self.stats, "synchronize"):
+            diag = self.integrator.synchronize(self.state, self.cfg, accel_fn)
 
         if self.cfg.record_history:
             self.state_history.append(diag.copy())
 
-        if self.cfg.record_frames and (step + 1) % self.cfg.frame_every == 0:
-            self.frames.append([(b.x, b.y, b.z) for b in diag.bodies])
+        if (step + 1) % self.cfg.frame_every == 0:
+            with timed(self.stats, "frame_recording"):
+                self._record_frame(diag, step + 1)
 
         if self.cfg.enable_diagnostics and (step + 1) % self.cfg.diagnostics_every == 0:
-            self._update_diagnostics(diag)
+            with timed(self.stats, "diagnostics"):
+                self._update_diagnostics(diag)
+
+        if self.theta_controller is not None:
+            if self._diagnostics_worker is not None and (step + 1) % self.theta_controller.every == 0:
+                # the controller reads energy_drift, which must be recorded up to this step
+                self._diagnostics_worker.drain()
+            self.theta_controller.update(self, step + 1)
+
+        self.step_count = step + 1
+        if self.stats is not None:
+            self.stats.steps += 1
+        self._maybe_checkpoint()
+        return diag
+
+
+    def _merge_collisions(self, step):
+        bodies, events = merge_collisions(self.state.bodies, self.cfg.collision_radius)
+        if not events:
+            return
+        # the cached accelerations belong to the old body list; synchronize recomputes them
+        self.state = SystemState(bodies)
+        for event in events:
+            event["step"] = step
+            event["time"] = step * self.cfg.dt
+        self.merge_events.extend(events)
+        if self.stats is not None:
+            self.stats.count("mergers", sum(len(e["members"]) - 1 for e in events))
+
+
+    def _maybe_checkpoint(self):
+        cfg = self.cfg
+        if cfg.checkpoint_path is None:
+            return
+        due = cfg.checkpoint_every > 0 and self.step_count % cfg.checkpoint_every == 0
+        if not due and cfg.checkpoint_seconds > 0:
+            due = time.perf_counter() - self._last_checkpoint_time >= cfg.checkpoint_seconds
+        if due:
+            if self._diagnostics_worker is not None:
+                self._diagnostics_worker.drain()
+            save_checkpoint(self, cfg.checkpoint_path)
+            self._last_checkpoint_time = time.perf_counter()
 
 
     def _update_diagnostics(self, diag, is_initial=False): #measures the system, stores the raw values and computes drifts 
-        K = compute_kinetic_energy(diag.bodies)
-        U = compute_potential_energy(diag.bodies, self.cfg)
+        m, pos, vel = bodies_to_arrays(diag.bodies)
+        for a in (m, pos, vel):
+            a.flags.writeable = False  # the snapshot may be read from another thread
+        snapshot = (m, pos, vel)
+
+        if self._diagnostics_worker is not None:
+            self._diagnostics_worker.submit(snapshot, is_initial)
+        else:
+            self._record_diagnostics(self._measure_diagnostics(snapshot), is_initial)
+
+
+    def _measure_diagnostics(self, snapshot):
+        m, pos, vel = snapshot
+        K = compute_kinetic_energy_arrays(m, vel)
+        U = compute_potential_energy_arrays(m, pos, self.cfg.softening)
+        L = compute_angular_momentum_arrays(m, pos, vel)
+        P = compute_linear_momentum_arrays(m, vel)
+        com = compute_center_of_mass_arrays(m, pos)
+        return K, U, L, P, com
+
+
+    def _record_diagnostics(self, values, is_initial=False):
+        K, U, L, P, (x_cm, y_cm, z_cm) = values
         E = K + U
-        L = compute_angular_momentum(diag.bodies)
-        P = compute_linear_momentum(diag.bodies)
-        x_cm, y_cm, z_cm = compute_center_of_mass(diag.bodies)
 
         L_mag = math.sqrt(L[0]**2 + L[1]**2 + L[2]**2)
         self.angular_momentum_history.append(L_mag)
@@ -135,6 +358,10 @@ class Simulation:
 
         if is_initial:
             self.E0 = E
+            self.L0 = L
+            self.P0 = P
+            self.com0 = (x_cm, y_cm, z_cm)
+            self.L0_mag = L_mag
             self.E_scale = max(abs(E), abs(K) + abs(U), 1e-12)
             self.energy_drift.append(0.0)
 
@@ -172,6 +399,7 @@ class Simulation:
 
     def _clear_histories(self):
         self.state_history.clear()
+        self.merge_events.clear()
 
         self.kinetic_history.clear()
         self.potential_history.clear()
@@ -187,22 +415,18 @@ class Simulation:
         self.com_history.clear()
         self.com_drift.clear()
 
-        self.frames.clear()
-
+        self.theta_history.clear()
 
-    def show(self, x0, y0, x1, y1):
-        pss = self.run()
-
-        fig, ax = plt.subplots()
-        ax.set_xlim(x0, x1)
-        ax.set_ylim(y0, y1)
+        self.frames.clear()
 
-        scatters = [ax.scatter([], []) for _ in range(len(self.state.bodies))]
 
-        def update(frame):
-            for i, sc in enumerate(scatters):
-                sc.set_offsets(pss[frame][i])
-            return scatters
+    def show(self, x0=None, y0=None, x1=None, y1=None, every: int = 1, interval: int = 30, use_process: bool = False):
+        """
+        Run the simulation while drawing it live (see live.show_live); the view
+        limits default to the initial positions.
+        """
+        from code.nbody.live import show_live
 
-        FuncAnimation(fig, update, frames=len(pss), interval=1, blit=True, repeat=False)
-        plt.show()
\ No newline at end of file
+        xlim = (x0, x1) if x0 is not None and x1 is not None else None
+        ylim = (y0, y1) if y0 is not None and y1 is not None else None
+        return show_live(self, xlim, ylim, every=every, interval=interval, use_process=use_process)
@@ -3,6 +3,8 @@
 ##it asks the solver for accelerations and uses them to update positions and velocities, then returns the system 
 
 
+from time import perf_counter
+
 from code.nbody.bodies import Body, SystemState
 from code.nbody.integrators import Integrator
 
@@ -17,6 +19,7 @@ class EulerIntegrator(Integrator):
         # compute accelerations for all bodies
         ax, ay, az = accel_fn(bodies)
 
+        t0 = perf_counter()
         new_bodies = []
         for i, b in enumerate(bodies):
             nb = Body(b.m, b.x, b.y, b.z)
@@ -32,6 +35,11 @@ class EulerIntegrator(Integrator):
             
             new_bodies.append(nb)
 
+        stats = getattr(cfg, "stats", None)
+        if stats is not None:
+            stats.add_time("update", perf_counter() - t0)
+            stats.count("body_allocations", len(new_bodies))
+
         return SystemState(new_bodies)
     
 
@@ -1,3 +1,5 @@
+from time import perf_counter
+
 from code.nbody.bodies import Body, SystemState
 from code.nbody.integrators import Integrator
 
@@ -16,6 +18,8 @@ class LeapfrogIntegrator(Integrator):
 
         ax, ay, az = accel_fn(bodies)
 
+        stats = getattr(cfg, "stats", None)
+        t0 = perf_counter()
         new_bodies = []
         for i, b in enumerate(bodies):
             # v^{1/2} = v^0 + 0.5*dt*a(x^0)
@@ -24,13 +28,19 @@ class LeapfrogIntegrator(Integrator):
             vz_half = b.vz + 0.5 * dt * az[i]
             new_bodies.append(Body(b.m, b.x, b.y, b.z, vx_half, vy_half, vz_half))
 
+        if stats is not None:
+            stats.add_time("kick", perf_counter() - t0)
+            stats.count("body_allocations", len(new_bodies))
+
         return SystemState(new_bodies, accel=(ax, ay, az))
 
     def step(self, state, cfg, accel_fn):
         bodies = state.bodies
         dt = cfg.dt
+        stats = getattr(cfg, "stats", None)
 
         # Drift: x^{n+1} = x^n + dt * v^{n+1/2}
+        t0 = perf_counter()
         drifted = []
         for b in bodies:
             drifted.append(Body(
@@ -43,9 +53,12 @@ class LeapfrogIntegrator(Integrator):
                 b.vz
             ))
 
+        t1 = perf_counter()
+
         # Kick: v^{n+3/2} = v^{n+1/2} + dt * a(x^{n+1})
         ax_new, ay_new, az_new = accel_fn(drifted)
 
+        t2 = perf_counter()
         new_bodies = []
         for i, b in enumerate(drifted):
             vx_new = b.vx + dt * ax_new[i]
@@ -53,6 +66,11 @@ class LeapfrogIntegrator(Integrator):
             vz_new = b.vz + dt * az_new[i]
             new_bodies.append(Body(b.m, b.x, b.y, b.z, vx_new, vy_new, vz_new))
 
+        if stats is not None:
+            stats.add_time("drift", t1 - t0)
+            stats.add_time("kick", perf_counter() - t2)
+            stats.count("body_allocations", len(drifted) + len(new_bodies))
+
         return SystemState(new_bodies, accel=(ax_new, ay_new, az_new))
 
     def synchronize(self, state, cfg, accel_fn):
@@ -75,4 +93,8 @@ class LeapfrogIntegrator(Integrator):
             vz_full = b.vz - 0.5 * dt * az[i]
             synced.append(Body(b.m, b.x, b.y, b.z, vx_full, vy_full, vz_full))
 
+        stats = getattr(cfg, "stats", None)
+        if stats is not None:
+            stats.count("body_allocations", len(synced))
+
         return SystemState(synced)
\ No newline at end of file
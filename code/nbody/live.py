@@ -0,0 +1,167 @@
+## Live viewer: the simulation runs on a worker thread (or process) and publishes
+## positions into a fixed-size ring buffer; the matplotlib UI polls the newest frame
+## at its own refresh rate. Frames the UI is too slow for are simply overwritten,
+## so drawing never holds back the integrator.
+
+
+from __future__ import annotations
+
+import threading
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class FrameRing:
+    """
+    capacity slots of (n_bodies, 3) float64 positions plus per-slot (seq, step, count).
+
+    Single writer, any number of readers, no locks: the writer marks a slot as busy
+    (seq = -1) while filling it, and readers retry if the slot's seq changed while
+    they copied it. shared=True puts the buffer in shared memory so the ring can be
+    handed to another process.
+    """
+
+    def __init__(self, n_bodies: int, capacity: int = 8, shared: bool = False):
+        self.n_bodies = n_bodies
+        self.capacity = capacity
+        size = self._nbytes(n_bodies, capacity)
+        self._shm = SharedMemory(create=True, size=size) if shared else None
+        self._owner = True
+        self._attach(self._shm.buf if shared else bytearray(size))
+        self.head[0] = 0
+
+    @staticmethod
+    def _nbytes(n_bodies, capacity):
+        return 8 * (capacity * n_bodies * 3 + capacity * 3 + 1)
+
+    def _attach(self, buf):
+        cap, n = self.capacity, self.n_bodies
+        self.frames = np.ndarray((cap, n, 3), dtype=np.float64, buffer=buf)
+        self.meta = np.ndarray((cap, 3), dtype=np.int64, buffer=buf, offset=self.frames.nbytes)
+        self.head = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=self.frames.nbytes + self.meta.nbytes)
+
+    def __getstate__(self):
+        if self._shm is None:
+            raise TypeError("only shared=True rings can be sent to another process")
+        return {"name": self._shm.name, "n_bodies": self.n_bodies, "capacity": self.capacity}
+
+    def __setstate__(self, state):
+        self.n_bodies = state["n_bodies"]
+        self.capacity = state["capacity"]
+        self._shm = SharedMemory(name=state["name"])
+        self._owner = False
+        self._attach(self._shm.buf)
+
+    def publish(self, step: int, positions):
+        pos = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        seq = int(self.head[0])
+        k = seq % self.capacity
+        n = min(len(pos), self.n_bodies)
+        self.meta[k, 0] = -1
+        self.frames[k, :n] = pos[:n]
+        self.meta[k, 1] = step
+        self.meta[k, 2] = n
+        self.meta[k, 0] = seq
+        self.head[0] = seq + 1
+
+    def published(self) -> int:
+        return int(self.head[0])
+
+    def latest(self):
+        # (seq, step, positions copy) of the newest complete frame, or None before the first one
+        while True:
+            seq = int(self.head[0]) - 1
+            if seq < 0:
+                return None
+            k = seq % self.capacity
+            if self.meta[k, 0] != seq:
+                continue  # overwritten since we read head, look again
+            step, n = int(self.meta[k, 1]), int(self.meta[k, 2])
+            pos = self.frames[k, :n].copy()
+            if self.meta[k, 0] == seq:
+                return seq, step, pos
+
+    def close(self):
+        if self._shm is not None:
+            # drop our views before releasing the buffer
+            self.frames = self.meta = self.head = None
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+
+def _produce(sim, ring: FrameRing, every: int, stop, done):
+    try:
+        for view in sim.iter_steps(every=every):
+            ring.publish(view.step, view.positions())
+            if stop.is_set():
+                break
+    finally:
+        done.set()
+
+
+def show_live(sim, xlim=None, ylim=None, every: int = 1, interval: int = 30,
+              use_process: bool = False, capacity: int = 8, title: str | None = None):
+    """
+    Run sim while showing its newest xy positions; closing the window stops the run.
+
+    use_process=True integrates in a child process (no GIL contention with the UI),
+    but then sim itself is not advanced; with the default thread sim holds the
+    final (or interrupted) state afterwards. Returns the number of frames drawn.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    from code.nbody.viz import _robust_lim_from_frames
+
+    first = np.array([(b.x, b.y, b.z) for b in sim.state.bodies], dtype=np.float64).reshape(-1, 3)
+    if xlim is None or ylim is None:
+        lim = _robust_lim_from_frames(first, percentile=99.0, padding=2.0)
+        xlim = xlim or (-lim, lim)
+        ylim = ylim or (-lim, lim)
+
+    ring = FrameRing(len(first), capacity, shared=use_process)
+    if use_process:
+        ctx = get_context()
+        stop, done = ctx.Event(), ctx.Event()
+        worker = ctx.Process(target=_produce, args=(sim, ring, every, stop, done), daemon=True)
+    else:
+        stop, done = threading.Event(), threading.Event()
+        worker = threading.Thread(target=_produce, args=(sim, ring, every, stop, done), daemon=True)
+    worker.start()
+
+    fig, ax = plt.subplots()
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.set_aspect("equal", adjustable="box")
+    if title:
+        ax.set_title(title)
+    # one collection for all bodies, updated in place
+    sc = ax.scatter(first[:, 0], first[:, 1], s=4 if len(first) > 200 else 16, linewidths=0)
+    label = ax.text(0.02, 0.98, "", transform=ax.transAxes, va="top", fontsize=9)
+    shown = {"seq": -1, "frames": 0, "dropped": 0}
+
+    def update(_):
+        got = ring.latest()
+        if got is not None and got[0] != shown["seq"]:
+            seq, step, pos = got
+            shown["dropped"] += max(seq - shown["seq"] - 1, 0)
+            shown["seq"] = seq
+            shown["frames"] += 1
+            sc.set_offsets(pos[:, :2])
+            label.set_text(f"step {step}  (skipped {shown['dropped']} frames)")
+        if done.is_set() and shown["seq"] == ring.published() - 1 and "anim" in shown:
+            shown["anim"].event_source.stop()  # run finished and its last frame is on screen
+        return sc, label
+
+    shown["anim"] = FuncAnimation(fig, update, interval=interval, blit=True, cache_frame_data=False)
+    try:
+        plt.show()
+    finally:
+        stop.set()
+        worker.join()
+        ring.close()
+    return shown["frames"]
@@ -0,0 +1,301 @@
+## Loads initial conditions from .npy / .npz, CSV or raw binary files
+##
+## Everything comes back as (m, pos, vel) float64 arrays in project units
+## (AU, M_sun, AU/yr with G = 4*pi^2). Files are read in chunks of chunk_rows rows
+## (memory-mapped for .npy / raw binary), so only the selected columns are ever
+## held in memory.
+
+
+from __future__ import annotations
+
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+
+FIELDS = ("m", "x", "y", "z", "vx", "vy", "vz")
+REQUIRED = ("m", "x", "y")  # z and velocities default to 0
+
+AU_KM = 1.495978707e8
+YEAR_S = 365.25 * 86400.0
+
+LENGTH_UNITS = {
+    "au": 1.0,
+    "km": 1.0 / AU_KM,
+    "m": 1.0 / (AU_KM * 1e3),
+    "pc": 206264.80624709636,
+    "kpc": 206264806.24709636,
+}
+MASS_UNITS = {
+    "msun": 1.0,
+    "mjup": 9.547919e-4,
+    "mearth": 3.00348959632e-6,
+    "kg": 1.0 / 1.98847e30,
+}
+VELOCITY_UNITS = {
+    "au/yr": 1.0,
+    "km/s": YEAR_S / AU_KM,
+    "m/s": YEAR_S / (AU_KM * 1e3),
+}
+
+FORMATS = ("npy", "npz", "csv", "raw")
+
+
+def unit_scale(value, table: dict) -> float:
+    # a unit name from table or a plain number (factor to project units)
+    if isinstance(value, (int, float)):
+        return float(value)
+    key = str(value).strip().lower()
+    if key in table:
+        return table[key]
+    try:
+        return float(key)
+    except ValueError:
+        raise ValueError(f"Unknown unit '{value}' (expected one of {', '.join(table)} or a number)")
+
+
+def parse_columns(spec: str | None) -> dict | None:
+    """
+    "m=mass,x=px,y=py" -> {"m": "mass", "x": "px", "y": "py"}.
+    Sources are column names (CSV header / npz key / structured field) or 0-based indices.
+    """
+    if not spec:
+        return None
+    columns = {}
+    for item in spec.split(","):
+        field, _, source = item.partition("=")
+        field, source = field.strip(), source.strip()
+        if field not in FIELDS or not source:
+            raise ValueError(f"Bad column mapping '{item}' (expected <field>=<source>, field in {FIELDS})")
+        columns[field] = int(source) if source.lstrip("-").isdigit() else source
+    return columns
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".npy", ".npz"):
+        return suffix[1:]
+    if suffix in (".csv", ".txt", ".dat"):
+        return "csv"
+    return "raw"
+
+
+def _resolve(columns: dict | None, names) -> dict:
+    # field -> column index, given the file's column names (None when unnamed)
+    n_cols = len(names)
+    if columns is None:
+        if names[0] is not None and any(n in FIELDS for n in names):
+            columns = {f: f for f in FIELDS if f in names}
+        else:
+            columns = {f: i for i, f in enumerate(FIELDS[:n_cols])}
+
+    out = {}
+    for field, source in columns.items():
+        if isinstance(source, int):
+            if not -n_cols <= source < n_cols:
+                raise ValueError(f"Column {source} for '{field}' is out of range ({n_cols} columns)")
+            out[field] = source % n_cols
+        elif source in names:
+            out[field] = list(names).index(source)
+        elif names[0] is None:
+            raise ValueError(f"Column '{source}' for '{field}': this file has no column names, use an index")
+        else:
+            raise ValueError(f"Column '{source}' for '{field}' not found in {list(names)}")
+
+    missing = [f for f in REQUIRED if f not in out]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    return out
+
+
+# field -> (destination array, column)
+_TARGETS = {"m": ("m", None)}
+_TARGETS.update({f: ("pos", i) for i, f in enumerate(FIELDS[1:4])})
+_TARGETS.update({f: ("vel", i) for i, f in enumerate(FIELDS[4:])})
+
+
+class _Output:
+    # preallocated (or growing, for CSV) destination arrays with unit scaling
+    def __init__(self, n: int, mass_scale: float, length_scale: float, velocity_scale: float):
+        self.m = np.empty(n)
+        self.pos = np.zeros((n, 3))
+        self.vel = np.zeros((n, 3))
+        self.scales = {"m": mass_scale, "pos": length_scale, "vel": velocity_scale}
+
+    def fill(self, start: int, field: str, values):
+        name, col = _TARGETS[field]
+        dest = getattr(self, name)[start:start + len(values)]
+        if col is not None:
+            dest = dest[:, col]
+        np.multiply(values, self.scales[name], out=dest)
+
+    def grow(self, n: int):
+        for name in ("m", "pos", "vel"):
+            old = getattr(self, name)
+            new = np.zeros((n,) + old.shape[1:])
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def finish(self, n: int):
+        m, pos, vel = self.m[:n], self.pos[:n], self.vel[:n]
+        if not (np.isfinite(m).all() and np.isfinite(pos).all() and np.isfinite(vel).all()):
+            raise ValueError("Initial conditions contain NaN or infinite values")
+        if (m < 0).any():
+            raise ValueError("Initial conditions contain negative masses")
+        return m, pos, vel
+
+
+def _copy_table(table, index: dict, out: _Output, chunk_rows: int):
+    # table: 2-D (rows, cols) array-like, typically a memmap
+    n = len(table)
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(table[start:start + chunk_rows], dtype=np.float64)
+        for field, col in index.items():
+            out.fill(start, field, block[:, col])
+
+
+def _copy_fields(sources: dict, out: _Output, chunk_rows: int):
+    # sources: field -> 1-D array-like (npz members, structured-array fields)
+    n = len(out.m)
+    for start in range(0, n, chunk_rows):
+        for field, src in sources.items():
+            out.fill(start, field, np.asarray(src[start:start + chunk_rows], dtype=np.float64))
+
+
+def _load_npy(path, columns, scales, chunk_rows):
+    data = np.load(path, mmap_mode="r")
+    if data.dtype.names:
+        names = data.dtype.names
+        index = _resolve(columns, names)
+        out = _Output(len(data), *scales)
+        _copy_fields({f: data[names[i]] for f, i in index.items()}, out, chunk_rows)
+        return out.finish(len(data))
+
+    if data.ndim != 2:
+        raise ValueError(f"{path}: expected a 2-D (N, columns) array, got shape {data.shape}")
+    index = _resolve(columns, [None] * data.shape[1])
+    out = _Output(data.shape[0], *scales)
+    _copy_table(data, index, out, chunk_rows)
+    return out.finish(data.shape[0])
+
+
+def _load_npz(path, columns, scales, chunk_rows):
+    with np.load(path) as data:
+        keys = data.files
+        if len(keys) == 1 and columns is None:
+            table = data[keys[0]]
+            if table.ndim != 2:
+                raise ValueError(f"{path}: expected a 2-D (N, columns) array, got shape {table.shape}")
+            out = _Output(len(table), *scales)
+            _copy_table(table, _resolve(None, [None] * table.shape[1]), out, chunk_rows)
+            return out.finish(len(table))
+
+        if columns is None and {"m", "pos"} <= set(keys):
+            # the layout of bodies_to_arrays(): m (N,), pos (N, 3), vel (N, 3)
+            m, pos = data["m"], data["pos"]
+            sources = {"m": m}
+            sources.update({f: pos[:, i] for i, f in enumerate(FIELDS[1:1 + pos.shape[1]])})
+            if "vel" in keys:
+                vel = data["vel"]
+                sources.update({f: vel[:, i] for i, f in enumerate(FIELDS[4:4 + vel.shape[1]])})
+        else:
+            index = _resolve(columns, keys)
+            sources = {f: data[keys[i]] for f, i in index.items()}
+
+        n = len(sources["m"])
+        if any(len(s) != n for s in sources.values()):
+            raise ValueError(f"{path}: columns have different lengths")
+        out = _Output(n, *scales)
+        _copy_fields(sources, out, chunk_rows)
+        return out.finish(n)
+
+
+def _load_csv(path, columns, scales, chunk_rows, delimiter):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line for line in f if line.strip() and not line.lstrip().startswith("#"))
+        first = next(lines, None)
+        if first is None:
+            raise ValueError(f"{path}: no data")
+
+        cells = [c.strip() for c in first.split(delimiter)]
+        try:
+            [float(c) for c in cells]
+            header, pending = [None] * len(cells), [first]
+        except ValueError:
+            header, pending = cells, []
+
+        index = _resolve(columns, header)
+        usecols = sorted(set(index.values()))
+        pick = {f: usecols.index(c) for f, c in index.items()}
+
+        out = _Output(chunk_rows, *scales)
+        n = 0
+        while True:
+            chunk = pending + list(islice(lines, chunk_rows - len(pending)))
+            pending = []
+            if not chunk:
+                break
+            block = np.loadtxt(chunk, delimiter=delimiter, usecols=usecols, ndmin=2)
+            if n + len(block) > len(out.m):
+                out.grow(2 * len(out.m))
+            for field, col in pick.items():
+                out.fill(n, field, block[:, col])
+            n += len(block)
+        return out.finish(n)
+
+
+def _load_raw(path, columns, scales, chunk_rows, raw_columns, raw_dtype, raw_offset):
+    dtype = np.dtype(raw_dtype)
+    size = Path(path).stat().st_size - raw_offset
+    row_bytes = dtype.itemsize * raw_columns
+    if size < 0 or size % row_bytes:
+        raise ValueError(f"{path}: {size} bytes is not a whole number of {raw_columns}-column {dtype} rows")
+
+    table = np.memmap(path, dtype=dtype, mode="r", offset=raw_offset, shape=(size // row_bytes, raw_columns))
+    out = _Output(len(table), *scales)
+    _copy_table(table, _resolve(columns, [None] * raw_columns), out, chunk_rows)
+    return out.finish(len(table))
+
+
+def load_arrays(
+    path,
+    fmt: str | None = None,
+    columns: dict | None = None,
+    length_unit="au",
+    mass_unit="msun",
+    velocity_unit="au/yr",
+    chunk_rows: int = 1 << 18,
+    delimiter: str = ",",
+    raw_columns: int = 7,
+    raw_dtype: str = "<f8",
+    raw_offset: int = 0,
+):
+    """
+    Read (m, pos, vel) from a file, converted to AU / M_sun / AU-per-yr.
+
+    fmt:      one of FORMATS, guessed from the suffix when None (unknown suffix -> raw)
+    columns:  field -> source column (name or 0-based index), see parse_columns().
+              Default: header / key names that match FIELDS, otherwise the columns
+              in FIELDS order (m, x, y, z, vx, vy, vz); missing z / velocities are 0.
+    *_unit:   unit name (see LENGTH_UNITS etc.) or factor to project units
+    raw_*:    raw binary layout: row-major records of raw_columns values of raw_dtype
+              after a raw_offset-byte header
+    """
+    path = Path(path)
+    fmt = fmt or detect_format(path)
+    scales = (
+        unit_scale(mass_unit, MASS_UNITS),
+        unit_scale(length_unit, LENGTH_UNITS),
+        unit_scale(velocity_unit, VELOCITY_UNITS),
+    )
+
+    if fmt == "npy":
+        return _load_npy(path, columns, scales, chunk_rows)
+    if fmt == "npz":
+        return _load_npz(path, columns, scales, chunk_rows)
+    if fmt == "csv":
+        return _load_csv(path, columns, scales, chunk_rows, delimiter)
+    if fmt == "raw":
+        return _load_raw(path, columns, scales, chunk_rows, raw_columns, raw_dtype, raw_offset)
+    raise ValueError(f"Unknown format '{fmt}' (expected one of {', '.join(FORMATS)})")
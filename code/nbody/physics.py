@@ -4,9 +4,18 @@
 
 import math
 from typing import List
+
+import numpy as np
+
 from code.nbody.bodies import Body, G
 
 
+class SofteningConfig:
+    # stand-in for SimulationConfig where only the force / energy functions run (they read softening only)
+    def __init__(self, softening: float):
+        self.softening = softening
+
+
 def compute_accelerations(bodies: List[Body], cfg):
     N = len(bodies)
 
@@ -50,6 +59,33 @@ def compute_accelerations(bodies: List[Body], cfg):
     return ax, ay, az
 
 
+def compute_accelerations_rows(bodies: List[Body], start: int, stop: int, softening: float):
+    # accelerations of bodies[start:stop] due to all bodies; each pair is evaluated from
+    # both sides, so row blocks can be computed independently (see DirectSolver workers)
+    soft2 = softening * softening
+    ax = []
+    ay = []
+    az = []
+    for i in range(start, stop):
+        bi = bodies[i]
+        sx = sy = sz = 0.0
+        for bj in bodies:
+            if bj is bi:
+                continue
+            dx = bj.x - bi.x
+            dy = bj.y - bi.y
+            dz = bj.z - bi.z
+            r2 = dx * dx + dy * dy + dz * dz + soft2
+            f = G * bj.m / (r2 * r2 ** 0.5)
+            sx += f * dx
+            sy += f * dy
+            sz += f * dz
+        ax.append(sx)
+        ay.append(sy)
+        az.append(sz)
+    return ax, ay, az
+
+
 
 def compute_kinetic_energy(bodies: List[Body]):
     Total = 0.0
@@ -114,3 +150,76 @@ def compute_center_of_mass(bodies):
 
 
 
+## Vectorized versions of the diagnostics above, working on (m, pos, vel) arrays
+## (see bodies_to_arrays). Same quantities, only the summation order differs.
+
+def compute_kinetic_energy_arrays(m, vel):
+    return float(0.5 * np.dot(m, np.einsum("ij,ij->i", vel, vel)))
+
+
+def compute_potential_energy_arrays(m, pos, softening, block: int = 512):
+    # pairwise sum over i < j, done in row blocks so memory stays O(block * N);
+    # massless tracers add nothing, so only the massive bodies are summed
+    massive = m != 0.0
+    m, pos = m[massive], pos[massive]
+    N = len(m)
+    soft2 = softening * softening
+    total = 0.0
+    for i0 in range(0, N, block):
+        i1 = min(i0 + block, N)
+        d = pos[i0:i1, None, :] - pos[None, i0:, :]
+        dist = np.sqrt(np.einsum("ijk,ijk->ij", d, d) + soft2)
+        # keep only j > i inside this block of rows
+        rows = np.arange(i0, i1)[:, None]
+        cols = np.arange(i0, N)[None, :]
+        upper = cols > rows
+        pair = np.where(upper, m[i0:i1, None] * m[None, i0:] / np.where(upper, dist, 1.0), 0.0)
+        total += pair.sum()
+    return float(-G * total)
+
+
+def compute_angular_momentum_arrays(m, pos, vel):
+    lx, ly, lz = (m[:, None] * np.cross(pos, vel)).sum(axis=0)
+    return (float(lx), float(ly), float(lz))
+
+
+def compute_linear_momentum_arrays(m, vel):
+    px, py, pz = (m[:, None] * vel).sum(axis=0)
+    return (float(px), float(py), float(pz))
+
+
+def compute_center_of_mass_arrays(m, pos):
+    total_mass = m.sum()
+    if total_mass > 0:
+        x_cm, y_cm, z_cm = (m[:, None] * pos).sum(axis=0) / total_mass
+    else:
+        x_cm, y_cm, z_cm = (m[:, None] * pos).sum(axis=0)
+    return (float(x_cm), float(y_cm), float(z_cm))
+
+
+def compute_accelerations_at(targets, m, pos, softening, block: int = 256):
+    """
+    Accelerations at arbitrary target points (M, 3) due to sources (m, pos), as an
+    (M, 3) array. Coincident target/source pairs are skipped, so a target that is
+    itself one of the sources does not feel its own mass.
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    soft2 = softening * softening
+    out = np.empty_like(targets)
+    for i0 in range(0, len(targets), block):
+        d = pos[None, :, :] - targets[i0:i0 + block, None, :]
+        r2 = np.einsum("ijk,ijk->ij", d, d)
+        same = r2 == 0.0
+        r2 = r2 + soft2
+        inv_r3 = np.where(same, 0.0, 1.0 / (np.where(same, 1.0, r2) * np.sqrt(np.where(same, 1.0, r2))))
+        out[i0:i0 + block] = G * np.einsum("ij,ijk->ik", m[None, :] * inv_r3, d)
+    return out
+
+
+def compute_relative_force_errors(approx, reference):
+    # per-body |a - a_ref| / |a_ref| for two (ax, ay, az) results of the same bodies
+    a = np.asarray(approx, dtype=np.float64)
+    ref = np.asarray(reference, dtype=np.float64)
+    ref_norm = np.sqrt((ref * ref).sum(axis=0))
+    err_norm = np.sqrt(((a - ref) ** 2).sum(axis=0))
+    return err_norm / np.where(ref_norm > 0, ref_norm, 1.0)
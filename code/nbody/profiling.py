@@ -0,0 +1,154 @@
+## Profiling a run (cli run --profile)
+##
+## cProfile gives the .pstats file; a sampling thread reads the simulation thread's
+## Python stack every `interval` seconds and counts identical stacks, written as
+## collapsed stacks ("outer;inner;leaf count" per line) for flamegraph.pl,
+## speedscope, inferno and similar tools. Both are switched on only inside the step
+## window, so a slice of a long run can be profiled without paying for all of it.
+
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+
+def parse_window(spec: str | None):
+    # "200:300" -> (200, 300), "200:" -> (200, None); steps are 1-based and inclusive
+    if not spec:
+        return None
+    first, sep, last = spec.partition(":")
+    try:
+        start = int(first) if first.strip() else 1
+        stop = int(last) if sep and last.strip() else None
+    except ValueError:
+        raise ValueError(f"Bad step window '{spec}' (expected START:STOP, e.g. 100:200)")
+    if start < 1 or (stop is not None and stop < start):
+        raise ValueError(f"Bad step window '{spec}' (need 1 <= START <= STOP)")
+    return start, stop
+
+
+def _frame_label(code) -> str:
+    # ';' separates frames in the collapsed format, so it must not appear in a label
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread (the calling thread by default) from a
+    background thread while active; counts[stack] is the number of samples.
+    """
+
+    def __init__(self, thread_id: int | None = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = Counter()
+        self.active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.active.set()  # wake the loop if it is waiting for the window
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.active.wait()
+            if self._stop.wait(self.interval):
+                return
+            if not self.active.is_set():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path) -> Path:
+        path = Path(path)
+        with path.open("w", encoding="utf-8") as f:
+            for stack, n in sorted(self.counts.items()):
+                f.write(f"{stack} {n}\n")
+        return path
+
+
+class RunProfiler:
+    # cProfile + StackSampler, switched on and off together
+    def __init__(self, sample_interval: float = 0.005):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval=sample_interval)
+        self.enabled = False
+        self.used = False  # cProfile refuses to build Stats from a profile that never ran
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.used = True
+            self.sampler.active.set()
+            self.profile.enable()
+
+    def disable(self):
+        if self.enabled:
+            self.profile.disable()
+            self.sampler.active.clear()
+            self.enabled = False
+
+    def summary(self, limit: int = 20, sort: str = "cumulative") -> str:
+        if not self.used:
+            return "No steps fell inside the profiling window."
+        s = io.StringIO()
+        pstats.Stats(self.profile, stream=s).strip_dirs().sort_stats(sort).print_stats(limit)
+        return s.getvalue()
+
+
+def profile_run(sim, out_dir, window=None, sample_interval: float = 0.005) -> dict:
+    """
+    Run sim like sim.run(), profiling only the steps in window ((start, stop) from
+    parse_window, None for the whole run including initialization).
+
+    Writes profile.pstats and profile.collapsed into out_dir and returns their paths
+    plus the number of samples; the pstats path is None when the window held no steps.
+    """
+    out_dir = Path(out_dir)
+    start, stop = window or (0, None)
+    prof = RunProfiler(sample_interval)
+    prof.sampler.start()
+    try:
+        if start == 0:
+            prof.enable()
+        # the view for step k is yielded right after step k, so steps start..stop
+        # run between the views for start - 1 and stop
+        for view in sim.iter_steps():
+            if view.step == start - 1:
+                prof.enable()
+            elif stop is not None and view.step == stop:
+                prof.disable()
+    finally:
+        prof.disable()
+        prof.sampler.stop()
+
+    pstats_path = None
+    if prof.used:
+        pstats_path = out_dir / "profile.pstats"
+        prof.profile.dump_stats(pstats_path)
+    collapsed_path = prof.sampler.write(out_dir / "profile.collapsed")
+    return {
+        "pstats": pstats_path,
+        "collapsed": collapsed_path,
+        "samples": sum(prof.sampler.counts.values()),
+        "summary": prof.summary(),
+    }
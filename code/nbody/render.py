@@ -0,0 +1,273 @@
+## Streaming, parallel animation rendering
+##
+## Frames are pulled lazily (trajectory file, frame list or any iterator) in batches;
+## each batch is rasterized on a process pool (scatter modes through an Agg canvas,
+## density mode straight from a 2D histogram to pixels, so its cost depends on the
+## resolution rather than N) and the finished images are written out strictly in
+## order: GIF through Pillow's frame-by-frame encoder, MP4 through an ffmpeg pipe.
+## At most 2 * workers batches are in flight, so peak memory is bounded by the
+## batch size rather than the run length.
+
+
+from __future__ import annotations
+
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from code.nbody.viz import (
+    DENSITY_BINS,
+    DENSITY_SAMPLE_FRAMES,
+    LIM_SAMPLE_FRAMES,
+    _frame_array,
+    _robust_lim_from_frames,
+    _sample_frames,
+    density_image,
+    density_rgb,
+    density_scale,
+    draw_xy_scene,
+    draw_xyz_scene,
+    lod_subset,
+    project,
+    set_frame_xy,
+    set_frame_xyz,
+    take_subset,
+    track_subset,
+    xyz_lims,
+)
+
+
+MODES = ("xy", "xyz", "density")
+FIGSIZES = {"xy": (6, 6), "xyz": (7, 6)}
+
+# per-process figure, built once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec: dict):
+    if spec["mode"] == "density":
+        lim, vmax = spec["limits"]
+
+        def render(pos):
+            counts = density_image(project(pos, spec["projection"]), lim, spec["bins"])
+            return density_rgb(counts, vmax, spec["log"])
+
+        _worker["render"] = render
+        return
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZES[spec["mode"]], dpi=spec["dpi"])
+    canvas = FigureCanvasAgg(fig)
+    if spec["mode"] == "xy":
+        sc = draw_xy_scene(fig, spec["first"], spec["limits"], spec["title"])
+        set_frame = set_frame_xy
+    else:
+        sc = draw_xyz_scene(fig, spec["first"], spec["limits"], spec["title"])
+        set_frame = set_frame_xyz
+
+    def render(pos):
+        set_frame(sc, pos)
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+    _worker["render"] = render
+
+
+def _render_batch(batch) -> np.ndarray:
+    # list of (N, 3) positions -> (len(batch), H, W, 3) uint8 RGB
+    render = _worker["render"]
+    return np.stack([render(pos) for pos in batch])
+
+
+class _GifSink:
+    # writes one GIF frame at a time; frames share the palette of the first one
+    def __init__(self, path: Path, fps: int):
+        self.path = path
+        self.duration = int(round(1000 / fps))
+        self._f = None
+        self._palette = None
+
+    def write(self, rgb: np.ndarray):
+        from PIL import GifImagePlugin, Image
+
+        im = Image.fromarray(rgb, "RGB")
+        if self._palette is None:
+            self._palette = im.quantize(256, dither=Image.Dither.NONE)
+            self._f = self.path.open("wb")
+            header, _ = GifImagePlugin.getheader(self._palette, info={"loop": 0, "duration": self.duration})
+            for block in header:
+                self._f.write(block)
+        frame = im.quantize(palette=self._palette, dither=Image.Dither.NONE)
+        for block in GifImagePlugin.getdata(frame, duration=self.duration, disposal=1):
+            self._f.write(block)
+
+    def close(self):
+        if self._f is not None:
+            self._f.write(b";")
+            self._f.close()
+
+
+class _FFmpegSink:
+    def __init__(self, path: Path, fps: int):
+        import matplotlib
+
+        self.path = path
+        self.fps = fps
+        self.ffmpeg = matplotlib.rcParams["animation.ffmpeg_path"]
+        self._proc = None
+
+    def write(self, rgb: np.ndarray):
+        if self._proc is None:
+            h, w, _ = rgb.shape
+            cmd = [
+                self.ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(self.fps), "-i", "-",
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-vcodec", "libx264", "-pix_fmt", "yuv420p",
+                str(self.path),
+            ]
+            try:
+                self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+            except FileNotFoundError:
+                raise RuntimeError(f"ffmpeg not found ('{self.ffmpeg}'); install it or save a .gif instead")
+        self._proc.stdin.write(np.ascontiguousarray(rgb).tobytes())
+
+    def close(self):
+        if self._proc is not None:
+            self._proc.stdin.close()
+            if self._proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed with exit code {self._proc.returncode}")
+
+
+def _open_sink(out_path: Path, fps: int):
+    ext = out_path.suffix.lower()
+    if ext == ".gif":
+        return _GifSink(out_path, fps)
+    if ext == ".mp4":
+        return _FFmpegSink(out_path, fps)
+    raise ValueError(f"Unsupported extension '{ext}'. Use .gif or .mp4")
+
+
+def _batches(frames, size: int, subset=None):
+    it = iter(frames)
+    while True:
+        batch = [take_subset(_frame_array(f), subset) for f in islice(it, size)]
+        if not batch:
+            return
+        yield batch
+
+
+def render_animation(
+    frames,
+    out_path: str | Path,
+    mode: str = "xy",
+    title: str | None = None,
+    fps: int = 30,
+    dpi: int = 100,
+    batch_size: int = 16,
+    workers: int | None = None,
+    projection: str = "xy",
+    bins: int = DENSITY_BINS,
+    log: bool = True,
+    max_points: int | None = None,
+    masses=None,
+    density_weight: float = 0.0,
+    merge_events=None,
+) -> Path:
+    """
+    Render frames (a trajectory path, a TrajectoryReader / frame list, or any
+    iterator of (N, 3) positions) to a .gif or .mp4 without holding the run in memory.
+
+    Axis limits come from a sample of up to LIM_SAMPLE_FRAMES frames when frames
+    supports len() / indexing, otherwise from the first batch; at most
+    LIM_SAMPLE_POINTS positions are gathered for them.
+    workers=1 renders in this process (no pool).
+
+    mode="density" draws a bins x bins histogram of the positions projected with
+    `projection` (see viz.PROJECTIONS), log-scaled unless log=False; title and
+    dpi do not apply to it.
+
+    max_points / masses / density_weight: draw a fixed level-of-detail subset of the
+    bodies (see viz.lod_subset) in the scatter modes; merge_events (the run's
+    collision mergers) keeps that subset on the same bodies after mergers.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}' (expected one of {', '.join(MODES)})")
+    if isinstance(frames, (str, os.PathLike)):
+        from code.nbody.trajectory import TrajectoryReader
+        frames = TrajectoryReader(frames)
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    indexable = hasattr(frames, "__len__") and hasattr(frames, "__getitem__")
+    if indexable:
+        if len(frames) == 0:
+            raise ValueError("No frames to render.")
+        first = _frame_array(frames[0])
+    else:
+        frames = iter(frames)
+        peek = next(frames, None)
+        if peek is None:
+            raise ValueError("No frames to render.")
+        first = _frame_array(peek)
+        frames = chain([peek], frames)
+
+    subset = None
+    if max_points is not None and mode != "density":
+        subset = track_subset(lod_subset(first, max_points, masses, density_weight), len(first), merge_events)
+    first = take_subset(first, subset)
+
+    batches = _batches(frames, batch_size, subset)
+    if indexable:
+        T = len(frames)
+        if mode == "density":
+            idx = np.unique(np.linspace(0, T - 1, num=min(T, DENSITY_SAMPLE_FRAMES)).astype(int))
+            head = [frames[i] for i in idx]
+        else:
+            head = frames
+    else:
+        head = next(batches)
+        batches = chain([head], batches)
+
+    # limits come from a bounded body subsample (density reads its frames one by one),
+    # so this never holds more than a batch plus LIM_SAMPLE_POINTS positions
+    if mode == "density":
+        limits = density_scale(head, projection, bins)
+    elif mode == "xy":
+        limits = _robust_lim_from_frames(_sample_frames(head, LIM_SAMPLE_FRAMES), percentile=99.0, padding=2.0)
+    else:
+        limits = xyz_lims(_sample_frames(head, LIM_SAMPLE_FRAMES))
+    spec = {
+        "mode": mode, "first": first, "limits": limits, "title": title, "dpi": dpi,
+        "projection": projection, "bins": bins, "log": log,
+    }
+
+    sink = _open_sink(out_path, fps)
+    try:
+        if workers == 1:
+            _init_worker(spec)
+            for batch in batches:
+                for image in _render_batch(batch):
+                    sink.write(image)
+        else:
+            with ProcessPoolExecutor(workers, mp_context=get_context(), initializer=_init_worker, initargs=(spec,)) as pool:
+                pending = deque()
+                for batch in chain(batches, [None]):
+                    if batch is not None:
+                        pending.append(pool.submit(_render_batch, batch))
+                    # drain in submission order once the window is full (or at the end)
+                    while pending and (batch is None or len(pending) >= 2 * workers):
+                        for image in pending.popleft().result():
+                            sink.write(image)
+    finally:
+        sink.close()
+    return out_path
@@ -2,8 +2,10 @@ import math
 import random
 from typing import List
 
-from code.nbody.bodies import Body, G
-from code.nbody.physics import compute_kinetic_energy, compute_potential_energy
+import numpy as np
+
+from code.nbody.bodies import Body, G, Tracer, bodies_from_arrays
+from code.nbody.physics import SofteningConfig, compute_kinetic_energy, compute_potential_energy
 
 
 def two_body(separation: float = 1.0, mass: float = 1.0, v: float | None = None):
@@ -77,11 +79,7 @@ def random_cluster(
         bodies.append(Body(m, x, y, z, vx, vy, vz))
 
     if virialize:
-        class _Cfg:
-            def __init__(self, softening: float):
-                self.softening = softening
-
-        cfg = _Cfg(softening)
+        cfg = SofteningConfig(softening)
         K = compute_kinetic_energy(bodies)
         U = compute_potential_energy(bodies, cfg)
 
@@ -103,16 +101,19 @@ def disk(
     mass: float = 5e-2,
     v_scale: float = 0.18,
     thickness: float = 0.05,
+    tracers: int = 0,
 ) -> List[Body]:
     """
     Simple rotating disk for demos.
 
     Positions start in a flat disk, and velocities are tangential so it spins.
+    tracers adds that many massless test particles drawn from the same disk
+    after the n massive bodies.
     """
     rng = random.Random(seed)
     bodies: List[Body] = []
 
-    for _ in range(n):
+    for k in range(n + tracers):
         r = radius * math.sqrt(rng.random())
         theta = rng.uniform(0.0, 2.0 * math.pi)
 
@@ -124,7 +125,10 @@ def disk(
         vx = -speed * math.sin(theta)
         vy =  speed * math.cos(theta)
 
-        bodies.append(Body(mass, x, y, z, vx, vy, 0.0))
+        if k < n:
+            bodies.append(Body(mass, x, y, z, vx, vy, 0.0))
+        else:
+            bodies.append(Tracer(x, y, z, vx, vy, 0.0))
 
 
     return bodies
@@ -154,7 +158,227 @@ def benchmark_cluster(
     )
 
 
+## Vectorized equilibrium models for large N.
+## The *_arrays functions return (m, pos, vel) NumPy arrays (shapes (N,), (N, 3), (N, 3)),
+## centered on the COM with zero net momentum; the scene functions wrap them as Body lists.
+
+
+def _isotropic(rng, r):
+    # points at radii r with uniformly random directions
+    cos_t = rng.uniform(-1.0, 1.0, size=r.shape)
+    phi = rng.uniform(0.0, 2.0 * np.pi, size=r.shape)
+    sin_t = np.sqrt(1.0 - cos_t * cos_t)
+    return np.stack((r * sin_t * np.cos(phi), r * sin_t * np.sin(phi), r * cos_t), axis=1)
+
+
+def _rejection_sample(rng, n, pdf, pdf_max, batch=None):
+    # samples u in [0, 1) from an unnormalized pdf(u) <= pdf_max, in vectorized batches
+    out = np.empty(0)
+    batch = batch or max(2 * n, 1024)
+    while out.size < n:
+        u = rng.random(batch)
+        keep = rng.random(batch) * pdf_max < pdf(u)
+        out = np.concatenate((out, u[keep]))
+    return out[:n]
+
+
+def _finish(m, pos, vel, U):
+    # move to the COM frame and rescale velocities so that 2K = |U| exactly (analytic U)
+    pos = pos - (m[:, None] * pos).sum(axis=0) / m.sum()
+    vel = vel - (m[:, None] * vel).sum(axis=0) / m.sum()
+    K = 0.5 * np.dot(m, np.einsum("ij,ij->i", vel, vel))
+    if K > 0.0 and U < 0.0:
+        vel = vel * math.sqrt(-U / (2.0 * K))
+    return m, pos, vel
+
+
+def plummer_arrays(
+    n: int,
+    seed: int = 0,
+    total_mass: float = 1.0,
+    scale_radius: float = 1.0,
+    mass_cut: float = 0.999,
+):
+    """
+    Plummer sphere sampled from its isotropic distribution function
+    (Aarseth, Henon & Wielen 1974). mass_cut truncates the infinite tail.
+    """
+    rng = np.random.default_rng(seed)
+    M, a = total_mass, scale_radius
+
+    X = rng.uniform(0.0, mass_cut, size=n)
+    X = np.maximum(X, 1e-12)
+    r = a / np.sqrt(X ** (-2.0 / 3.0) - 1.0)
+    pos = _isotropic(rng, r)
+
+    # speed as a fraction q of the local escape speed, g(q) = q^2 (1 - q^2)^(7/2)
+    q = _rejection_sample(rng, n, lambda u: u * u * (1.0 - u * u) ** 3.5, 0.1)
+    v_esc = np.sqrt(2.0 * G * M / a) * (1.0 + (r / a) ** 2) ** -0.25
+    vel = _isotropic(rng, q * v_esc)
+
+    m = np.full(n, M / n)
+    U = -3.0 * math.pi * G * M * M / (32.0 * a)
+    return _finish(m, pos, vel, U)
+
+
+def hernquist_arrays(
+    n: int,
+    seed: int = 0,
+    total_mass: float = 1.0,
+    scale_radius: float = 1.0,
+    mass_cut: float = 0.98,
+):
+    """
+    Hernquist (1990) sphere. Radii are exact; velocities are Gaussian with the
+    analytic isotropic Jeans dispersion, capped at the local escape speed.
+    """
+    rng = np.random.default_rng(seed)
+    M, a = total_mass, scale_radius
+
+    sx = np.sqrt(rng.uniform(0.0, mass_cut, size=n))
+    r = a * sx / (1.0 - sx)
+    r = np.maximum(r, 1e-6 * a)
+    pos = _isotropic(rng, r)
+
+    s = r / a
+    sigma2 = (G * M / (12.0 * a)) * (
+        12.0 * s * (1.0 + s) ** 3 * np.log((1.0 + s) / s)
+        - s / (1.0 + s) * (25.0 + 52.0 * s + 42.0 * s * s + 12.0 * s ** 3)
+    )
+    sigma = np.sqrt(np.maximum(sigma2, 0.0))
+    v_esc = np.sqrt(2.0 * G * M / (r + a))
+
+    vel = rng.normal(size=(n, 3)) * sigma[:, None]
+    bad = np.einsum("ij,ij->i", vel, vel) >= v_esc ** 2
+    while bad.any():
+        vel[bad] = rng.normal(size=(bad.sum(), 3)) * sigma[bad, None]
+        bad = np.einsum("ij,ij->i", vel, vel) >= v_esc ** 2
+
+    m = np.full(n, M / n)
+    U = -G * M * M / (6.0 * a)
+    return _finish(m, pos, vel, U)
+
+
+def _king_profile(W0: float, n_grid: int = 4000):
+    """
+    Dimensionless King (1966) model: integrates
+        W'' + 2 W' / r = -9 rho(W) / rho0,   W(0) = W0, W'(0) = 0
+    (r in King radii) with RK4 until W = 0 at the tidal radius.
+    Returns radii, W, cumulative mass and potential energy, all dimensionless.
+    """
+    from math import erf
+
+    def rho(W):
+        if W <= 0.0:
+            return 0.0
+        return math.exp(W) * erf(math.sqrt(W)) - math.sqrt(4.0 * W / math.pi) * (1.0 + 2.0 * W / 3.0)
+
+    rho0 = rho(W0)
+
+    def deriv(r, y):
+        W, dW = y
+        return dW, -9.0 * rho(W) / rho0 - 2.0 * dW / r
+
+    # start slightly off-center using the series W ~ W0 - 1.5 r^2
+    r = 1e-4
+    y = (W0 - 1.5 * r * r, -3.0 * r)
+    h = 10.0 / n_grid
+    rs, Ws = [0.0, r], [W0, y[0]]
+    while y[0] > 0.0 and r < 1e4:
+        k1 = deriv(r, y)
+        k2 = deriv(r + h / 2, (y[0] + h / 2 * k1[0], y[1] + h / 2 * k1[1]))
+        k3 = deriv(r + h / 2, (y[0] + h / 2 * k2[0], y[1] + h / 2 * k2[1]))
+        k4 = deriv(r + h, (y[0] + h * k3[0], y[1] + h * k3[1]))
+        y = (
+            y[0] + h / 6 * (k1[0] + 2 * k2[0] + 2 * k3[0] + k4[0]),
+            y[1] + h / 6 * (k1[1] + 2 * k2[1] + 2 * k3[1] + k4[1]),
+        )
+        r += h
+        rs.append(r)
+        Ws.append(max(y[0], 0.0))
+        h = min(h * 1.002, 0.05 * r)  # grid spacing grows with radius
+
+    rs = np.array(rs)
+    Ws = np.array(Ws)
+    dens = np.array([rho(w) for w in Ws]) / rho0
+
+    # M(r) = int 4 pi rho r^2 dr and U = -int G M(r) dM / r (G = rho0 = r0 = 1)
+    shell = 4.0 * np.pi * dens * rs * rs
+    mass = np.concatenate(([0.0], np.cumsum(0.5 * (shell[1:] + shell[:-1]) * np.diff(rs))))
+    integrand = np.where(rs > 0, mass * shell / np.where(rs > 0, rs, 1.0), 0.0)
+    U = -np.sum(0.5 * (integrand[1:] + integrand[:-1]) * np.diff(rs))
+    return rs, Ws, mass, U
+
+
+def king_arrays(
+    n: int,
+    seed: int = 0,
+    total_mass: float = 1.0,
+    king_radius: float = 1.0,
+    W0: float = 6.0,
+):
+    """
+    King (1966) lowered-isothermal model with central potential W0.
+    Radii follow the integrated mass profile; speeds are drawn from
+    f(E) ~ exp(W - v^2 / 2 sigma^2) - 1 below the local escape speed.
+    """
+    rng = np.random.default_rng(seed)
+    rs, Ws, mass, U_dimless = _king_profile(W0)
+
+    # physical scales: M = rho0 r0^3 M_dimless and r0^2 = 9 sigma^2 / (4 pi G rho0)
+    M_dimless = mass[-1]
+    rho0 = total_mass / (king_radius ** 3 * M_dimless)
+    sigma = math.sqrt(4.0 * math.pi * G * rho0 * king_radius ** 2 / 9.0)
+
+    r_dimless = np.interp(rng.uniform(0.0, M_dimless, size=n), mass, rs)
+    W = np.interp(r_dimless, rs, Ws)
+    pos = _isotropic(rng, r_dimless * king_radius)
+
+    # u = v / v_esc with pdf ~ u^2 (exp(W (1 - u^2)) - 1); bound it per W from a table
+    u_grid = np.linspace(0.0, 1.0, 257)
+    W_table = np.linspace(0.0, W0, 129)
+    g_table = (u_grid[None, :] ** 2 * np.expm1(W_table[:, None] * (1.0 - u_grid[None, :] ** 2))).max(axis=1)
+    g_max = 1.05 * np.interp(W, W_table, g_table) + 1e-300
+
+    u = np.empty(n)
+    todo = np.arange(n)
+    while todo.size:
+        trial = rng.random(todo.size)
+        g = trial * trial * np.expm1(W[todo] * (1.0 - trial * trial))
+        accept = rng.random(todo.size) * g_max[todo] < g
+        u[todo[accept]] = trial[accept]
+        todo = todo[~accept]
+
+    v_esc = sigma * np.sqrt(2.0 * W)
+    vel = _isotropic(rng, u * v_esc)
+
+    m = np.full(n, total_mass / n)
+    U = U_dimless * G * rho0 ** 2 * king_radius ** 5
+    return _finish(m, pos, vel, U)
+
+
+def plummer(n: int = 1000, seed: int = 0, total_mass: float = 1.0, scale_radius: float = 1.0) -> List[Body]:
+    """
+    Plummer sphere in virial equilibrium (vectorized, fine for very large n).
+    """
+    return bodies_from_arrays(*plummer_arrays(n, seed, total_mass, scale_radius))
+
+
+def hernquist(n: int = 1000, seed: int = 0, total_mass: float = 1.0, scale_radius: float = 1.0) -> List[Body]:
+    """
+    Hernquist sphere (cuspy, galaxy-like) in virial equilibrium.
+    """
+    return bodies_from_arrays(*hernquist_arrays(n, seed, total_mass, scale_radius))
+
+
+def king(n: int = 1000, seed: int = 0, total_mass: float = 1.0, king_radius: float = 1.0, W0: float = 6.0) -> List[Body]:
+    """
+    King model (tidally truncated cluster); W0 sets the concentration.
+    """
+    return bodies_from_arrays(*king_arrays(n, seed, total_mass, king_radius, W0))
+
+
 def list_scenes() -> List[str]:
-    return ["two_body", "three_body", "random_cluster", "disk", "benchmark_cluster"]
+    return ["two_body", "three_body", "random_cluster", "disk", "benchmark_cluster", "plummer", "hernquist", "king"]
 
 
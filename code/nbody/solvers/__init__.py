@@ -1,6 +1,21 @@
 #allows interchangeable solver implementations
 
+from code.nbody.bodies import Tracer
+
+
+def as_targets(targets):
+    # Body objects are used as they are, (x, y, z) probe points become massless Tracers
+    return [t if hasattr(t, "x") else Tracer(*t) for t in targets]
+
+
 class Solver: 
     def accelerations(self, bodies, cfg): #returns the accelerations as a tuple of lists
         raise NotImplementedError()
-    
+
+    def accelerations_at(self, targets, sources, cfg):
+        # accelerations at targets (bodies or (x, y, z) points) due to sources only, as a tuple of lists;
+        # a target that is one of the sources does not feel itself. Not counted in cfg.stats.
+        raise NotImplementedError()
+
+    def close(self): #releases worker processes, if the solver started any
+        pass
@@ -0,0 +1,92 @@
+## Feedback controller that adjusts BarnesHutSolver.theta during a run
+##
+## Every `every` steps it compares the tree accelerations of a random sample of bodies
+## with direct summation (O(sample * N)) and looks at how fast the energy drift grew
+## since the last check. Too much error -> smaller theta (more accurate, slower);
+## comfortably under budget -> larger theta (cheaper).
+
+
+import random
+
+import numpy as np
+
+from code.nbody.bodies import bodies_to_arrays
+from code.nbody.physics import compute_accelerations_at, compute_relative_force_errors
+
+
+class ThetaController:
+    def __init__(
+        self,
+        target_error: float = 1e-2,
+        max_energy_drift: float | None = None,
+        theta_min: float = 0.2,
+        theta_max: float = 1.2,
+        every: int = 10,
+        sample_size: int = 32,
+        shrink: float = 0.8,
+        grow: float = 1.1,
+        seed: int = 0,
+    ):
+        """
+        target_error:     allowed 99th-percentile relative force error on the sample
+        max_energy_drift: allowed relative energy drift over the whole run (needs
+                          diagnostics); spread evenly over cfg.timesteps as a rate
+        """
+        self.target_error = target_error
+        self.max_energy_drift = max_energy_drift
+        self.theta_min = theta_min
+        self.theta_max = theta_max
+        self.every = every
+        self.sample_size = sample_size
+        self.shrink = shrink
+        self.grow = grow
+        self.rng = random.Random(seed)
+
+        self._last_drift = 0.0
+        self._last_step = 0
+
+    def sample_force_error(self, sim):
+        bodies = sim.state.bodies
+        n = len(bodies)
+        idx = self.rng.sample(range(n), min(self.sample_size, n))
+
+        m, pos, _ = bodies_to_arrays(bodies)
+        ref = compute_accelerations_at(pos[idx], m, pos, sim.cfg.softening)
+
+        if sim.state.accel is not None:
+            # leapfrog caches a(x^n) for the current positions, so no extra tree walk
+            ax, ay, az = sim.state.accel
+            approx = np.array([[ax[i] for i in idx], [ay[i] for i in idx], [az[i] for i in idx]])
+        else:
+            approx = np.array(sim.solver.accelerations_at([bodies[i] for i in idx], bodies, sim.cfg))
+
+        return float(np.percentile(compute_relative_force_errors(approx, ref.T), 99))
+
+    def _drift_rate_ok(self, sim, step):
+        # None when there is no energy signal to use
+        if self.max_energy_drift is None or not sim.energy_drift:
+            return None
+        drift = abs(sim.energy_drift[-1])
+        steps = max(step - self._last_step, 1)
+        rate = max(drift - self._last_drift, 0.0) / steps
+        self._last_drift = drift
+        return rate <= self.max_energy_drift / max(sim.cfg.timesteps, 1)
+
+    def update(self, sim, step):
+        if step % self.every != 0:
+            return
+
+        solver = sim.solver
+        err = self.sample_force_error(sim)
+        drift_ok = self._drift_rate_ok(sim, step)
+        self._last_step = step
+
+        # record the theta that produced this error, then adjust it for the next steps
+        theta = solver.theta
+        sim.theta_history.append((step, theta, err))
+
+        if err > self.target_error or drift_ok is False:
+            theta = max(self.theta_min, theta * self.shrink)
+        elif err < 0.5 * self.target_error and drift_ok is not False:
+            theta = min(self.theta_max, theta * self.grow)
+        solver.theta = theta
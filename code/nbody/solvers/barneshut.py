@@ -1,42 +1,92 @@
-from code.nbody.solvers import Solver
-from code.nbody.trees.octree import OctreeNode
+from time import perf_counter
+
+from code.nbody.solvers import Solver, as_targets
+from code.nbody.solvers.parallel import WorkerPool, chunk_bounds
+from code.nbody.trees.octree import build_octree
+
+
+def _source_tree(bodies):
+    # tracers (m == 0) are not sources, so they are kept out of the tree and only walk it
+    return build_octree([b for b in bodies if b.m != 0.0])
+
+
+def _walk_task(shared, start, stop, theta, softening, with_counters):
+    # every worker builds the same tree from the shared arrays; its own Body objects are
+    # in that tree, so the walk still recognizes each body's own leaf
+    t0 = perf_counter()
+    bodies = shared.bodies()
+    shared.close()
+    root = _source_tree(bodies)
+    counters = [0, 0, 0] if with_counters else None
+    acc = [root.compute_accelerations(b, theta, softening, counters) for b in bodies[start:stop]]
+    return acc, counters, root.node_count() if with_counters else None, perf_counter() - t0
 
 
 class BarnesHutSolver(Solver):
-    def __init__(self, theta=0.7):
+    def __init__(self, theta=0.7, workers=1):
+        # workers > 1 walks contiguous chunks of bodies on a process pool; each worker builds the tree itself
         self.theta = theta
+        self.workers = workers
+        self.worker_times = [0.0] * workers  # busy seconds per worker, summed over calls
+        self._pool = WorkerPool(workers) if workers > 1 else None
+
+    def build_tree(self, bodies):
+        return _source_tree(bodies)
 
     def accelerations(self, bodies, cfg):
         N = len(bodies)
+        stats = getattr(cfg, "stats", None)
 
         ax = [0.0] * N
         ay = [0.0] * N
         az = [0.0] * N
 
-        xs = [b.x for b in bodies] #build the bounding octree cube, used to caclulate center and size
-        ys = [b.y for b in bodies]
-        zs = [b.z for b in bodies]
-
-        cx = 0.5 * (min(xs) + max(xs)) #calculate the center 
-        cy = 0.5 * (min(ys) + max(ys))
-        cz = 0.5 * (min(zs) + max(zs))
-
-        size = max(  # calculate the size of the cube
-            max(xs) - min(xs),
-            max(ys) - min(ys),
-            max(zs) - min(zs),
-        )
-
-        half_size = 0.5 * size + 1e-10  # small padding to avoid zero size
+        counters = [0, 0, 0] if stats is not None else None
+        t0 = perf_counter()
+        if self._pool is None:
+            root = self.build_tree(bodies)
+            t1 = perf_counter()
+            for i, b in enumerate(bodies):
+                ax[i], ay[i], az[i] = root.compute_accelerations(
+                    b, self.theta, cfg.softening, counters
+                )
+            tree_nodes = root.node_count() if stats is not None else None
+        else:
+            # tree_build is then only the copy into shared memory; the builds run in the workers
+            shared = self._pool.share(bodies)
+            t1 = perf_counter()
+            tree_nodes = 0
+            bounds = chunk_bounds(N, self.workers)
+            tasks = [(shared, a, b, self.theta, cfg.softening, counters is not None) for a, b in bounds]
+            results = self._pool.map(_walk_task, tasks)
+            for k, ((a, _), (acc, chunk_counters, tree_nodes, busy)) in enumerate(zip(bounds, results)):
+                for i, (cax, cay, caz) in enumerate(acc, start=a):
+                    ax[i], ay[i], az[i] = cax, cay, caz
+                if counters is not None:
+                    counters = [c + d for c, d in zip(counters, chunk_counters)]
+                self.worker_times[k] += busy
 
-        root = OctreeNode((cx, cy, cz), half_size) #initial octree node
+        if stats is not None:
+            stats.add_time("tree_build", t1 - t0)
+            stats.add_time("tree_traversal", perf_counter() - t1)
+            stats.count("node_openings", counters[0])
+            stats.count("particle_particle", counters[1])
+            stats.count("particle_node", counters[2])
+            stats.count("tree_nodes", tree_nodes)
 
-        for b in bodies: 
-            root.insert(b)
+        return ax, ay, az
 
-        for i, b in enumerate(bodies):
-            ax[i], ay[i], az[i] = root.compute_accelerations(
-                b, self.theta, cfg.softening
-            )
+    def accelerations_at(self, targets, sources, cfg):
+        # one tree over the sources, walked once per target: O(N log N) build + O(M log N)
+        root = self.build_tree(sources)
+        ax, ay, az = [], [], []
+        for t in as_targets(targets):
+            cax, cay, caz = root.compute_accelerations(t, self.theta, cfg.softening)
+            ax.append(cax)
+            ay.append(cay)
+            az.append(caz)
+        return ax, ay, az
 
-        return ax, ay, az
\ No newline at end of file
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
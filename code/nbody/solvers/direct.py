@@ -1,9 +1,103 @@
 ##simplest solver, will change later
 
-from code.nbody.solvers import Solver
-from code.nbody.physics import compute_accelerations
+from time import perf_counter
+
+import numpy as np
+
+from code.nbody.bodies import split_tracers
+from code.nbody.solvers import Solver, as_targets
+from code.nbody.solvers.parallel import WorkerPool, chunk_bounds
+from code.nbody.physics import compute_accelerations, compute_accelerations_at, compute_accelerations_rows
+
+
+def _rows_task(shared, start, stop, softening):
+    t0 = perf_counter()
+    bodies = shared.bodies()
+    shared.close()
+    acc = compute_accelerations_rows(bodies, start, stop, softening)
+    return acc, perf_counter() - t0
+
 
 class DirectSolver(Solver):
+    def __init__(self, workers=1):
+        # workers > 1 splits the rows over a process pool; every pair is then evaluated twice
+        self.workers = workers
+        self.worker_times = [0.0] * workers  # busy seconds per worker, summed over calls
+        self._pool = WorkerPool(workers) if workers > 1 else None
+
     def accelerations(self, bodies, cfg):
-        return compute_accelerations(bodies, cfg) #uses physics module function to computer accelerations, then returns them
-    
+        massive, tracers = split_tracers(bodies)
+        if not tracers:
+            return self._massive_accelerations(bodies, cfg)
+        return self._tracer_accelerations(bodies, massive, tracers, cfg)
+
+    def accelerations_at(self, targets, sources, cfg):
+        # one (M, N) vectorized kernel; coincident target / source pairs are skipped
+        targets = as_targets(targets)
+        points = np.array([(t.x, t.y, t.z) for t in targets], dtype=np.float64).reshape(-1, 3)
+        m = np.array([b.m for b in sources], dtype=np.float64)
+        pos = np.array([(b.x, b.y, b.z) for b in sources], dtype=np.float64).reshape(-1, 3)
+        acc = compute_accelerations_at(points, m, pos, cfg.softening)
+        return acc[:, 0].tolist(), acc[:, 1].tolist(), acc[:, 2].tolist()
+
+    def _tracer_accelerations(self, bodies, massive, tracers, cfg):
+        # massive pairs as usual, then the tracers against the massive set only:
+        # O(N_massive * (N_massive + N_tracer)) instead of O(N^2)
+        N = len(bodies)
+        ax = [0.0] * N
+        ay = [0.0] * N
+        az = [0.0] * N
+        if not massive:
+            return ax, ay, az
+
+        sources = [bodies[i] for i in massive]
+        for i, cax, cay, caz in zip(massive, *self._massive_accelerations(sources, cfg)):
+            ax[i], ay[i], az[i] = cax, cay, caz
+
+        stats = getattr(cfg, "stats", None)
+        t0 = perf_counter()
+        acc = self.accelerations_at([bodies[i] for i in tracers], sources, cfg)
+        for i, cax, cay, caz in zip(tracers, *acc):
+            ax[i], ay[i], az[i] = cax, cay, caz
+
+        if stats is not None:
+            stats.add_time("direct_pairs", perf_counter() - t0)
+            stats.count("particle_particle", len(tracers) * len(massive))
+        return ax, ay, az
+
+    def _massive_accelerations(self, bodies, cfg):
+        if self._pool is not None:
+            return self._parallel_accelerations(bodies, cfg)
+
+        stats = getattr(cfg, "stats", None)
+        if stats is None:
+            return compute_accelerations(bodies, cfg) #uses physics module function to computer accelerations, then returns them
+
+        t0 = perf_counter()
+        acc = compute_accelerations(bodies, cfg)
+        N = len(bodies)
+        stats.add_time("direct_pairs", perf_counter() - t0)
+        stats.count("particle_particle", N * (N - 1) // 2)
+        return acc
+
+    def _parallel_accelerations(self, bodies, cfg):
+        stats = getattr(cfg, "stats", None)
+        t0 = perf_counter()
+        shared = self._pool.share(bodies)
+        tasks = [(shared, a, b, cfg.softening) for a, b in chunk_bounds(len(bodies), self.workers)]
+        ax, ay, az = [], [], []
+        for k, ((cax, cay, caz), busy) in enumerate(self._pool.map(_rows_task, tasks)):
+            ax += cax
+            ay += cay
+            az += caz
+            self.worker_times[k] += busy
+
+        if stats is not None:
+            N = len(bodies)
+            stats.add_time("direct_pairs", perf_counter() - t0)
+            stats.count("particle_particle", N * (N - 1))
+        return ax, ay, az
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
@@ -0,0 +1,97 @@
+## Process pool shared by the solvers' `workers` option
+##
+## Targets are cut into one contiguous chunk per worker. Once per force evaluation the
+## parent copies masses and positions into a shared-memory block (SharedBodies); a task
+## pickles only the block's name, and the worker rebuilds its own Body list (and tree)
+## from it, so the Python object graph never crosses the process boundary. Tasks report
+## how long they were busy, which the solvers add up per worker to expose load imbalance.
+
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from code.nbody.bodies import Body
+
+
+def chunk_bounds(n: int, parts: int) -> list[tuple[int, int]]:
+    # contiguous (start, stop) ranges of near-equal size, no empty ones
+    parts = max(1, min(parts, n))
+    bounds = [round(k * n / parts) for k in range(parts + 1)]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+class SharedBodies:
+    """
+    (m, x, y, z) of a body list in a shared-memory block owned by the parent, which
+    refills it with fill() before every batch of tasks and grows it when N does.
+    Pickling sends only the block's name; the unpickled copy attaches to the same block.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._shm = None
+        self._owner = True
+
+    def fill(self, bodies):
+        n = len(bodies)
+        if self._shm is None or self._shm.size < 32 * n:
+            self.close()
+            self._shm = SharedMemory(create=True, size=max(32 * n, 32))
+        self.n = n
+        rows = np.ndarray((n, 4), dtype=np.float64, buffer=self._shm.buf)
+        rows[...] = np.array([(b.m, b.x, b.y, b.z) for b in bodies], dtype=np.float64).reshape(-1, 4)
+        del rows  # no views may outlive the buffer
+        return self
+
+    def bodies(self) -> list[Body]:
+        # fresh Body objects (zero velocity) for the force kernels of this process
+        rows = np.ndarray((self.n, 4), dtype=np.float64, buffer=self._shm.buf).tolist()
+        return [Body(m, x, y, z, 0.0, 0.0, 0.0) for m, x, y, z in rows]
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "n": self.n}
+
+    def __setstate__(self, state):
+        self.n = state["n"]
+        self._shm = SharedMemory(name=state["name"])
+        self._owner = False
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+
+class WorkerPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+        self._shared = SharedBodies()
+
+    def share(self, bodies) -> SharedBodies:
+        # copy bodies into the shared block; pass the result in the tasks instead of bodies
+        return self._shared.fill(bodies)
+
+    def map(self, fn, tasks) -> list:
+        # tasks: list of argument tuples; results come back in task order
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context())
+        futures = [self._pool.submit(fn, *args) for args in tasks]
+        return [f.result() for f in futures]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._shared.close()
+
+    def __getstate__(self):
+        # the executor and the shared block cannot be pickled; a copy starts its own on first use
+        return {"workers": self.workers, "_pool": None, "_shared": SharedBodies()}
@@ -0,0 +1,97 @@
+## Per-phase timings and interaction counters collected during a run
+##
+## Enabled with cfg.collect_stats; the engine puts the live object on cfg.stats so solvers and
+## integrators can add to it. Everything is a plain float/int add, so the cost when enabled is a
+## couple of perf_counter() calls per phase; when disabled (cfg.stats is None) it is a None check,
+## and timed() hands back a shared no-op context without reading the clock.
+
+
+from contextlib import nullcontext
+from time import perf_counter
+
+
+PHASES = (
+    "tree_build",
+    "tree_traversal",
+    "direct_pairs",
+    "drift",
+    "kick",
+    "update",          # Euler's combined drift + kick
+    "synchronize",
+    "diagnostics",
+    "frame_recording",
+    "collisions",
+)
+
+COUNTERS = (
+    "node_openings",       # internal tree nodes opened during traversal
+    "particle_particle",   # body-body interactions (direct pairs or tree leaves)
+    "particle_node",       # body-node interactions (accepted multipoles)
+    "tree_nodes",          # octree nodes allocated
+    "body_allocations",    # Body objects allocated by integrators
+    "mergers",             # bodies absorbed by collisions
+)
+
+
+class SimulationStats:
+    def __init__(self):
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.steps = 0
+        self.wall_time = 0.0
+
+    def add_time(self, phase: str, seconds: float):
+        self.timings[phase] += seconds
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def as_dict(self) -> dict:
+        steps = max(self.steps, 1)
+        return {
+            "steps": self.steps,
+            "wall_time": self.wall_time,
+            "timings": dict(self.timings),
+            "counters": dict(self.counters),
+            "counters_per_step": {k: v / steps for k, v in self.counters.items()},
+        }
+
+    def report(self) -> str:
+        steps = max(self.steps, 1)
+        lines = [f"Run statistics ({self.steps} steps, {self.wall_time:.3f} s wall)"]
+        lines.append(f"  {'phase':<16} {'total (s)':>10} {'per step (ms)':>14} {'share':>7}")
+        for phase, t in self.timings.items():
+            if t == 0.0:
+                continue
+            share = t / self.wall_time if self.wall_time > 0 else 0.0
+            lines.append(f"  {phase:<16} {t:>10.3f} {1e3 * t / steps:>14.3f} {share:>7.1%}")
+        lines.append(f"  {'counter':<18} {'total':>14} {'per step':>14}")
+        for name, n in self.counters.items():
+            if n == 0:
+                continue
+            lines.append(f"  {name:<18} {n:>14d} {n / steps:>14.1f}")
+        return "\n".join(lines)
+
+
+class _Timer:
+    __slots__ = ("stats", "phase", "t0")
+
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.phase, perf_counter() - self.t0)
+
+
+_NOT_TIMED = nullcontext()
+
+
+def timed(stats, phase):
+    # tiny helper for "with timed(stats, 'phase'):" where a context manager reads better
+    if stats is None:
+        return _NOT_TIMED
+    return _Timer(stats, phase)
@@ -0,0 +1,208 @@
+## Parameter sweeps: runs a grid of configurations on a pool of worker processes
+##
+## Every job runs in its own process so a per-job timeout can actually stop it.
+## Results are appended to a CSV or JSON-lines file as soon as each job finishes,
+## which also lets an interrupted sweep be restarted with skip_existing=True.
+
+
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from pathlib import Path
+
+
+KEY_FIELDS = ("scene", "solver", "integrator", "theta", "dt", "steps", "softening")
+RESULT_FIELDS = KEY_FIELDS + (
+    "status",
+    "runtime",
+    "max_energy_drift",
+    "max_angular_drift",
+    "max_com_drift",
+    "error",
+)
+
+
+def expand_grid(scenes, solvers, integrators, thetas, dts, softenings, steps):
+    # theta only matters for barneshut, so direct jobs are not repeated per theta
+    jobs = []
+    seen = set()
+    for scene, solver, integrator, theta, dt, soft in itertools.product(
+        scenes, solvers, integrators, thetas, dts, softenings
+    ):
+        job = {
+            "scene": scene,
+            "solver": solver,
+            "integrator": integrator,
+            "theta": theta if solver == "barneshut" else None,
+            "dt": dt,
+            "steps": steps,
+            "softening": soft,
+        }
+        key = job_key(job)
+        if key not in seen:
+            seen.add(key)
+            jobs.append(job)
+    return jobs
+
+
+def _norm(v):
+    # CSV round-trips everything as text, so compare keys in a normalized form
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def job_key(job: dict) -> str:
+    return json.dumps([_norm(job.get(k)) for k in KEY_FIELDS])
+
+
+def run_job(job: dict) -> dict:
+    # imported lazily because cli imports this module
+    from code.nbody.cli import load_scene, make_solver, make_integrator
+    from code.nbody.cache import SceneCache
+    from code.nbody.engine import Simulation, SimulationConfig
+
+    # cache_dir is optional and not part of the job key: where scenes are cached does not change results
+    scene_cache = SceneCache(Path(job["cache_dir"]) / "scenes") if job.get("cache_dir") else SceneCache()
+    cfg = SimulationConfig(dt=job["dt"], timesteps=job["steps"], softening=job["softening"])
+    cfg.enable_diagnostics = True
+    sim = Simulation(
+        bodies=load_scene(job["scene"], scene_cache),
+        cfg=cfg,
+        integrator=make_integrator(job["integrator"]),
+        solver=make_solver(job["solver"], job["theta"]),
+    )
+
+    t0 = time.perf_counter()
+    sim.run()
+    runtime = time.perf_counter() - t0
+
+    return {
+        **job,
+        "status": "ok",
+        "runtime": runtime,
+        "max_energy_drift": max(abs(x) for x in sim.energy_drift),
+        "max_angular_drift": max(abs(x) for x in sim.angular_momentum_drift),
+        "max_com_drift": max(abs(x) for x in sim.com_drift),
+        "error": None,
+    }
+
+
+def _job_entry(conn, job):
+    sys.stdout = open(os.devnull, "w")  # keep per-step diagnostics prints out of the sweep log
+    try:
+        result = run_job(job)
+    except Exception as e:
+        result = {**job, "status": "error", "error": f"{type(e).__name__}: {e}"}
+    conn.send(result)
+    conn.close()
+
+
+class ResultWriter:
+    def __init__(self, path, append: bool):
+        self.path = Path(path)
+        self.fmt = "csv" if self.path.suffix.lower() == ".csv" else "jsonl"
+        write_header = not (append and self.path.exists() and self.path.stat().st_size > 0)
+        self._f = self.path.open("a" if append else "w", newline="", encoding="utf-8")
+        self._csv = None
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(self._f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            if write_header:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        row = {k: row.get(k) for k in RESULT_FIELDS}
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps(row) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path) -> list[dict]:
+    path = Path(path)
+    if not path.exists():
+        return []
+    with path.open("r", newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_sweep(jobs, out_path, workers: int | None = None, timeout: float | None = None,
+              skip_existing: bool = False, on_result=None) -> list[dict]:
+    """
+    Run jobs concurrently (at most `workers` processes) and stream each result
+    row to out_path (.csv, anything else is JSON lines) as it completes.
+
+    skip_existing: keep the existing file and skip jobs whose key is already in it
+                   (only successful rows count, failed / timed-out jobs are retried)
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    done = set()
+    if skip_existing:
+        done = {job_key(r) for r in read_results(out_path) if r.get("status") == "ok"}
+    pending = deque(j for j in jobs if job_key(j) not in done)
+
+    ctx = get_context()
+    running = {}  # connection -> (process, job, start time)
+    results = []
+
+    def finish(row):
+        writer.write(row)
+        results.append(row)
+        if on_result is not None:
+            on_result(row)
+
+    with ResultWriter(out_path, append=skip_existing) as writer:
+        while pending or running:
+            while pending and len(running) < workers:
+                job = pending.popleft()
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=_job_entry, args=(send_conn, job), daemon=True)
+                proc.start()
+                send_conn.close()
+                running[recv_conn] = (proc, job, time.perf_counter())
+
+            for conn in wait(list(running), timeout=0.1):
+                proc, job, _ = running.pop(conn)
+                try:
+                    row = conn.recv()
+                except EOFError:
+                    row = {**job, "status": "error", "error": f"worker exited with code {proc.exitcode}"}
+                conn.close()
+                proc.join()
+                finish(row)
+
+            if timeout is not None:
+                now = time.perf_counter()
+                for conn, (proc, job, t0) in list(running.items()):
+                    if now - t0 > timeout:
+                        proc.terminate()
+                        proc.join()
+                        conn.close()
+                        del running[conn]
+                        finish({**job, "status": "timeout", "runtime": now - t0})
+
+    return results
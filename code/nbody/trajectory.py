@@ -0,0 +1,190 @@
+## Binary trajectory format for recorded frames (positions and optionally velocities)
+##
+## Layout (little-endian):
+##   magic (8 bytes) | index offset (uint64) | header length (uint64) | JSON header
+##   chunk 0 | chunk 1 | ...          each chunk is float64[n_frames, n_bodies, n_cols]
+##   index                             chunk table + per-frame step numbers
+##
+## A chunk only ever holds frames with the same body count, so every frame can be opened
+## with numpy.memmap straight from the file without reading anything else.
+
+
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+
+MAGIC = b"NBTRAJ01"
+DTYPE = np.dtype("<f8")
+
+_PREAMBLE = struct.Struct("<8sQQ")  # magic, index offset, header length
+_CHUNK_ENTRY = np.dtype([("offset", "<u8"), ("first_frame", "<u8"), ("n_frames", "<u8"), ("n_bodies", "<u8")])
+
+
+class TrajectoryWriter:
+    """
+    Appends frames to a trajectory file in fixed-size chunks.
+
+    Frames are buffered in memory until chunk_frames of them are collected
+    (or the body count changes), then written as one contiguous block.
+    The index is written by close(); a file without it is treated as incomplete.
+    """
+
+    def __init__(self, path, metadata: dict | None = None, velocities: bool = False, chunk_frames: int = 64):
+        if chunk_frames <= 0:
+            raise ValueError("chunk_frames must be a positive integer")
+
+        self.path = Path(path)
+        self.velocities = velocities
+        self.n_cols = 6 if velocities else 3
+        self.chunk_frames = chunk_frames
+
+        header = dict(metadata or {})
+        header["columns"] = ["x", "y", "z", "vx", "vy", "vz"][: self.n_cols]
+        header["dtype"] = DTYPE.str
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-(_PREAMBLE.size + len(header_bytes)) % DTYPE.itemsize)  # keep chunks 8-byte aligned
+
+        self._f = self.path.open("wb")
+        self._f.write(_PREAMBLE.pack(MAGIC, 0, len(header_bytes)))
+        self._f.write(header_bytes)
+        self._header_len = len(header_bytes)
+
+        self._chunks = []
+        self._steps = []
+        self._buffer = []
+        self._buffer_n = None
+        self._n_frames = 0
+
+    def append(self, bodies, step: int = 0):
+        n = len(bodies)
+        if self._buffer and n != self._buffer_n:
+            self._flush()
+
+        frame = np.empty((n, self.n_cols), dtype=DTYPE)
+        frame[:, 0] = [b.x for b in bodies]
+        frame[:, 1] = [b.y for b in bodies]
+        frame[:, 2] = [b.z for b in bodies]
+        if self.velocities:
+            frame[:, 3] = [b.vx for b in bodies]
+            frame[:, 4] = [b.vy for b in bodies]
+            frame[:, 5] = [b.vz for b in bodies]
+
+        self._buffer.append(frame)
+        self._buffer_n = n
+        self._steps.append(step)
+
+        if len(self._buffer) >= self.chunk_frames:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        offset = self._f.tell()
+        block = np.stack(self._buffer)
+        self._f.write(block.tobytes())
+        self._chunks.append((offset, self._n_frames, len(self._buffer), self._buffer_n))
+        self._n_frames += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._flush()
+
+        index_offset = self._f.tell()
+        table = np.array(self._chunks, dtype=_CHUNK_ENTRY)
+        steps = np.asarray(self._steps, dtype="<i8")
+        self._f.write(struct.pack("<QQ", len(table), len(steps)))
+        self._f.write(table.tobytes())
+        self._f.write(steps.tobytes())
+
+        self._f.seek(0)
+        self._f.write(_PREAMBLE.pack(MAGIC, index_offset, self._header_len))
+        self._f.close()
+
+    def __len__(self):
+        return self._n_frames + len(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Random-access view of a trajectory file.
+
+    reader[i] returns the (N, 3) positions of frame i as a read-only memmap,
+    so only the pages that are actually touched get read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        with self.path.open("rb") as f:
+            magic, index_offset, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a trajectory file")
+            if index_offset == 0:
+                raise ValueError(f"{self.path} is incomplete (writer was not closed)")
+            self.metadata = json.loads(f.read(header_len).decode("utf-8"))
+
+            f.seek(index_offset)
+            n_chunks, n_steps = struct.unpack("<QQ", f.read(16))
+            self._chunks = np.frombuffer(f.read(n_chunks * _CHUNK_ENTRY.itemsize), dtype=_CHUNK_ENTRY)
+            self.steps = np.frombuffer(f.read(n_steps * 8), dtype="<i8")
+
+        self.n_cols = len(self.metadata["columns"])
+        self.has_velocities = self.n_cols == 6
+        self._first_frames = self._chunks["first_frame"].astype(np.int64)
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.steps)
+
+    def _chunk_view(self, k):
+        mm = self._maps.get(k)
+        if mm is None:
+            entry = self._chunks[k]
+            mm = np.memmap(
+                self.path,
+                dtype=DTYPE,
+                mode="r",
+                offset=int(entry["offset"]),
+                shape=(int(entry["n_frames"]), int(entry["n_bodies"]), self.n_cols),
+            )
+            self._maps[k] = mm
+        return mm
+
+    def _locate(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"frame {i} out of range for trajectory with {n} frames")
+        k = int(np.searchsorted(self._first_frames, i, side="right")) - 1
+        return self._chunk_view(k), i - int(self._first_frames[k])
+
+    def frame(self, i):
+        # full row (positions, plus velocities if stored)
+        mm, j = self._locate(i)
+        return mm[j]
+
+    def __getitem__(self, i):
+        return self.frame(i)[:, :3]
+
+    def velocities(self, i):
+        if not self.has_velocities:
+            raise ValueError(f"{self.path} was written without velocities")
+        return self.frame(i)[:, 3:6]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
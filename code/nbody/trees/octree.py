@@ -1,14 +1,21 @@
 from code.nbody.bodies import Body
 from code.nbody.bodies import G
+import heapq
 import math
 
+# leaves at this depth stop splitting and keep every body that lands in them (a bucket),
+# so coincident or nearly coincident bodies cannot make insertion recurse forever
+MAX_DEPTH = 48
+
 class OctreeNode:
-    def __init__(self, center, half_size):
+    def __init__(self, center, half_size, depth=0):
         self.total_mass = 0.0
         self.center_of_mass = (0.0, 0.0, 0.0)
         self.half_size = half_size
         self.center = center    
+        self.depth = depth
         self.body = None
+        self.bucket = None  # all bodies of a leaf at MAX_DEPTH once it holds more than one
         self.children = None 
 
 
@@ -16,6 +23,11 @@ class OctreeNode:
         if self.body is None and self.children is None:
             self.body = body_to_insert
 
+        elif self.children is None and self.depth >= MAX_DEPTH:
+            if self.bucket is None:
+                self.bucket = [self.body]
+            self.bucket.append(body_to_insert)
+
         elif self.children is None and self.body is not None:
             self.subdivide()
             temp = self.body
@@ -30,7 +42,7 @@ class OctreeNode:
         self._update_mass_and_com(body_to_insert) #this runs once per visit of node
 
 
-    def subdivide(self): #remember that this breaks when body has same position as another
+    def subdivide(self):
         quarter = self.half_size / 2
         offsets = [(-quarter, -quarter, -quarter), (quarter, -quarter, -quarter),
                    (-quarter, quarter, -quarter), (quarter, quarter, -quarter),
@@ -42,7 +54,7 @@ class OctreeNode:
             new_center = (self.center[0] + dx,
                           self.center[1] + dy,
                           self.center[2] + dz)
-            self.children.append(OctreeNode(new_center, quarter))
+            self.children.append(OctreeNode(new_center, quarter, self.depth + 1))
 
 
     def cube_to_insert(self, body: Body):
@@ -81,12 +93,21 @@ class OctreeNode:
             self.total_mass = new_M
 
 
-    def compute_accelerations(self, body: Body, theta: float, softening: float):
+    def node_count(self):
+        if self.children is None:
+            return 1
+        return 1 + sum(child.node_count() for child in self.children)
+
+
+    def compute_accelerations(self, body: Body, theta: float, softening: float, counters=None):
+        # counters, if given, is [node_openings, particle_particle, particle_node] updated in place
         total_mass = self.total_mass
         children = self.children
 
-        if total_mass == 0.0 or (self.body is body and children is None):
+        if total_mass == 0.0 or (self.body is body and children is None and self.bucket is None):
             return (0.0, 0.0, 0.0)
+        if self.bucket is not None and any(b is body for b in self.bucket):
+            return self._bucket_accelerations(body, softening, counters)
 
         bx, by, bz = body.x, body.y, body.z
         cx, cy, cz = self.center_of_mass
@@ -106,15 +127,19 @@ class OctreeNode:
         s = self.half_size * 2.0
 
         if children is None or (s / dist) < theta:
+            if counters is not None:
+                counters[1 if children is None else 2] += 1
             inv_dist = 1.0 / dist
             inv_dist3 = inv_dist / dist2
             factor = G * total_mass * inv_dist3
             return (factor * dx, factor * dy, factor * dz)
 
+        if counters is not None:
+            counters[0] += 1
         ax = ay = az = 0.0
         for child in children:
             if child.total_mass > 0.0:
-                cax, cay, caz = child.compute_accelerations(body, theta, softening)
+                cax, cay, caz = child.compute_accelerations(body, theta, softening, counters)
                 ax += cax
                 ay += cay
                 az += caz
@@ -122,5 +147,153 @@ class OctreeNode:
         return (ax, ay, az)
 
 
+    def _bucket_accelerations(self, body: Body, softening: float, counters=None):
+        # body sits in this bucket: sum the other members directly
+        soft2 = softening * softening
+        ax = ay = az = 0.0
+        for other in self.bucket:
+            if other is body:
+                continue
+            dx = other.x - body.x
+            dy = other.y - body.y
+            dz = other.z - body.z
+            dist2 = dx*dx + dy*dy + dz*dz + soft2
+            if dist2 == 0.0:
+                continue
+            factor = G * other.m / (dist2 * math.sqrt(dist2))
+            ax += factor * dx
+            ay += factor * dy
+            az += factor * dz
+            if counters is not None:
+                counters[1] += 1
+        return (ax, ay, az)
+
+
+    def leaf_bodies(self):
+        # the bodies stored in this leaf
+        if self.bucket is not None:
+            return self.bucket
+        return [] if self.body is None else [self.body]
+
+
+    def box_dist2(self, x, y, z):
+        # squared distance from a point to this node's cube (0 inside it)
+        cx, cy, cz = self.center
+        h = self.half_size
+        dx = max(abs(x - cx) - h, 0.0)
+        dy = max(abs(y - cy) - h, 0.0)
+        dz = max(abs(z - cz) - h, 0.0)
+        return dx*dx + dy*dy + dz*dz
+
+
+    def bodies_within(self, x, y, z, r2, out):
+        # appends every body with squared distance <= r2 to out, skipping cubes farther than that
+        if self.children is None:
+            for b in self.leaf_bodies():
+                dx = b.x - x
+                dy = b.y - y
+                dz = b.z - z
+                if dx*dx + dy*dy + dz*dz <= r2:
+                    out.append(b)
+            return
+        for child in self.children:
+            if (child.body is not None or child.children is not None) and child.box_dist2(x, y, z) <= r2:
+                child.bodies_within(x, y, z, r2, out)
+
+
+    def nearest(self, x, y, z, k):
+        # best-first search: [(squared distance, body)] of the k nearest bodies, closest first
+        best = []     # max-heap of (-d2, tiebreak, body)
+        queue = [(0.0, 0, self)]
+        tiebreak = 1
+        while queue:
+            d2_box, _, node = heapq.heappop(queue)
+            if len(best) == k and d2_box > -best[0][0]:
+                break  # every remaining cube is farther than the current k-th neighbour
+            if node.children is None:
+                for b in node.leaf_bodies():
+                    dx = b.x - x
+                    dy = b.y - y
+                    dz = b.z - z
+                    d2 = dx*dx + dy*dy + dz*dz
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, tiebreak, b))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, tiebreak, b))
+                    tiebreak += 1
+                continue
+            for child in node.children:
+                if child.body is not None or child.children is not None:
+                    heapq.heappush(queue, (child.box_dist2(x, y, z), tiebreak, child))
+                    tiebreak += 1
+        return [(-d2, b) for d2, _, b in sorted(best, reverse=True)]
+
+
+class NeighborTree:
+    """
+    Octree over all given bodies (tracers included) for batched neighbour queries.
+    Results are indices into bodies; a query point that is one of the bodies finds itself.
+    """
+
+    def __init__(self, bodies):
+        self.root = build_octree(bodies)
+        self._index = {id(b): i for i, b in enumerate(bodies)}
+
+    @staticmethod
+    def _coords(points):
+        # bodies or (x, y, z) tuples
+        return [(p.x, p.y, p.z) if hasattr(p, "x") else tuple(p) for p in points]
+
+    def query_radius(self, points, radius, return_distances=False):
+        """
+        For every point, the indices of the bodies within radius (unordered).
+        With return_distances=True returns (indices, distances) instead.
+        """
+        r2 = radius * radius
+        index = self._index
+        indices, distances = [], []
+        for x, y, z in self._coords(points):
+            found = []
+            self.root.bodies_within(x, y, z, r2, found)
+            indices.append([index[id(b)] for b in found])
+            if return_distances:
+                distances.append([math.sqrt((b.x-x)**2 + (b.y-y)**2 + (b.z-z)**2) for b in found])
+        return (indices, distances) if return_distances else indices
+
+    def query_knn(self, points, k):
+        # (indices, distances) of the k nearest bodies to every point, closest first
+        index = self._index
+        indices, distances = [], []
+        for x, y, z in self._coords(points):
+            hits = self.root.nearest(x, y, z, k) if k > 0 and self._index else []
+            indices.append([index[id(b)] for _, b in hits])
+            distances.append([math.sqrt(d2) for d2, _ in hits])
+        return indices, distances
+
+
+def build_octree(bodies):
+    if not bodies:
+        return OctreeNode((0.0, 0.0, 0.0), 1e-10)  # empty: every walk returns zero
+
+    xs = [b.x for b in bodies] #build the bounding octree cube, used to caclulate center and size
+    ys = [b.y for b in bodies]
+    zs = [b.z for b in bodies]
+
+    cx = 0.5 * (min(xs) + max(xs)) #calculate the center 
+    cy = 0.5 * (min(ys) + max(ys))
+    cz = 0.5 * (min(zs) + max(zs))
+
+    size = max(  # calculate the size of the cube
+        max(xs) - min(xs),
+        max(ys) - min(ys),
+        max(zs) - min(zs),
+    )
+
+    half_size = 0.5 * size + 1e-10  # small padding to avoid zero size
+
+    root = OctreeNode((cx, cy, cz), half_size) #initial octree node
+
+    for b in bodies: 
+        root.insert(b)
 
-        
\ No newline at end of file
+    return root
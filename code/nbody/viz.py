@@ -4,10 +4,13 @@ import math
 import json
 from pathlib import Path
 from datetime import datetime
+from itertools import groupby
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation, PillowWriter
 
+from code.nbody.collisions import remap_indices
+
 plt.rcParams.update({
     "font.size": 11,
     "axes.titlesize": 12,
@@ -22,6 +25,20 @@ STAR_ALPHA = 0.6
 STAR_SIZE = 1
 STAR_SEED = 123
 
+# max number of frames looked at when choosing axis limits (keeps long trajectories out of RAM)
+LIM_SAMPLE_FRAMES = 200
+# cap on the positions gathered for axis limits: a fixed body subsample is taken from
+# every sampled frame, so the sample stays this size however large N is
+LIM_SAMPLE_POINTS = 1 << 18
+
+PROJECTIONS = ("xy", "xz", "yz", "3d")
+DENSITY_BINS = 512
+DENSITY_CMAP = "magma"
+DENSITY_SAMPLE_FRAMES = 20
+
+# grid used by lod_subset to estimate local density
+LOD_GRID = 32
+
 
 def make_run_dir(outputs_dir: str | Path, scene: str, solver: str, integrator: str, n: int) -> Path:
     outputs_dir = Path(outputs_dir)
@@ -53,6 +70,35 @@ def apply_space_style(ax, lim: float, *, hide_axes: bool = True) -> None:
             spine.set_visible(False)
 
 
+def _frame_array(frame) -> np.ndarray:
+    # frames are either lists of (x, y, z) tuples or (N, 3) arrays / memmaps
+    return np.asarray(frame, dtype=float).reshape(-1, 3)
+
+
+def _sample_rows(n: int, max_rows: int):
+    # evenly spaced body indices, None when every body fits
+    if n <= max_rows:
+        return None
+    return np.linspace(0, n - 1, num=max(1, max_rows)).astype(int)
+
+
+def _frame_rows(frame, rows) -> np.ndarray:
+    # only the given bodies of a frame; memmaps read just those rows from disk
+    if rows is None:
+        return _frame_array(frame)
+    rows = rows[rows < len(frame)]
+    if isinstance(frame, np.ndarray):
+        return _frame_array(frame[rows])
+    return _frame_array([frame[i] for i in rows])
+
+
+def _sample_frames(frames, max_frames: int = LIM_SAMPLE_FRAMES, max_points: int = LIM_SAMPLE_POINTS) -> np.ndarray:
+    T = len(frames)
+    idx = np.unique(np.linspace(0, T - 1, num=min(T, max_frames)).astype(int))
+    rows = _sample_rows(len(frames[idx[0]]), max_points // len(idx))
+    return np.concatenate([_frame_rows(frames[i], rows) for i in idx], axis=0)
+
+
 def _robust_lim_from_frames(xy: np.ndarray, *, percentile: float = 99.0, padding: float = 2.0) -> float:
     x_all = xy[..., 0].ravel()
     y_all = xy[..., 1].ravel()
@@ -68,6 +114,52 @@ def _robust_lim_from_frames(xy: np.ndarray, *, percentile: float = 99.0, padding
     return lim
 
 
+def project(pos: np.ndarray, projection: str = "xy", elev: float = 30.0, azim: float = -60.0) -> np.ndarray:
+    # (N, 3) -> (N, 2) screen coordinates; "3d" is an orthographic view from (elev, azim) degrees
+    if projection == "xy":
+        return pos[:, :2]
+    if projection == "xz":
+        return pos[:, [0, 2]]
+    if projection == "yz":
+        return pos[:, 1:3]
+    if projection == "3d":
+        el, az = math.radians(elev), math.radians(azim)
+        right = np.array([-math.sin(az), math.cos(az), 0.0])
+        up = np.array([-math.sin(el) * math.cos(az), -math.sin(el) * math.sin(az), math.cos(el)])
+        return np.stack([pos @ right, pos @ up], axis=1)
+    raise ValueError(f"Unknown projection '{projection}' (expected one of {', '.join(PROJECTIONS)})")
+
+
+def density_image(xy: np.ndarray, lim: float, bins: int = DENSITY_BINS) -> np.ndarray:
+    # (bins, bins) body counts, row 0 = top (+y), bodies outside [-lim, lim] dropped
+    counts, _, _ = np.histogram2d(xy[:, 1], xy[:, 0], bins=bins, range=[[-lim, lim], [-lim, lim]])
+    return counts[::-1]
+
+
+def density_rgb(counts: np.ndarray, vmax: float, log: bool = True, cmap: str = DENSITY_CMAP) -> np.ndarray:
+    # counts -> (bins, bins, 3) uint8 through a colormap, scaled to a fixed vmax so frames don't flicker
+    if log:
+        values = np.log1p(counts) / math.log1p(max(vmax, 1.0))
+    else:
+        values = counts / max(vmax, 1.0)
+    lut = (plt.get_cmap(cmap)(np.linspace(0.0, 1.0, 256))[:, :3] * 255).astype(np.uint8)
+    return lut[np.clip(values * 255, 0, 255).astype(np.uint8)]
+
+
+def density_scale(frames_sample, projection: str = "xy", bins: int = DENSITY_BINS):
+    """
+    (lim, vmax) for density rendering from a few frames: lim covers 99.5% of the
+    projected positions (taken from a body subsample), vmax is the largest bin count
+    seen. Frames are read one at a time, so memmapped frames are never all in memory.
+    """
+    frames_sample = list(frames_sample)
+    rows = _sample_rows(len(frames_sample[0]), LIM_SAMPLE_POINTS // len(frames_sample))
+    sample = np.concatenate([project(_frame_rows(f, rows), projection) for f in frames_sample])
+    lim = _robust_lim_from_frames(sample, percentile=99.5, padding=1.2)
+    vmax = max(float(density_image(project(_frame_array(f), projection), lim, bins).max()) for f in frames_sample)
+    return lim, vmax
+
+
 def plot_final_xy(bodies, filepath: str | Path, title: str | None = None, clip_quantile: float | None = None) -> None:
     xs = [b.x for b in bodies]
     ys = [b.y for b in bodies]
@@ -107,6 +199,47 @@ def plot_energy_drift(energy_drift, filepath: str | Path, title: str | None = No
     plt.close()
 
 
+def plot_theta_history(theta_history, filepath: str | Path, title: str | None = None) -> None:
+    steps = [h[0] for h in theta_history]
+    fig, ax1 = plt.subplots(figsize=(7, 4))
+    ax1.plot(steps, [h[1] for h in theta_history], linewidth=1.5, color="tab:blue")
+    ax1.set_xlabel("step")
+    ax1.set_ylabel("theta", color="tab:blue")
+    ax2 = ax1.twinx()
+    ax2.plot(steps, [max(h[2], 1e-16) for h in theta_history], linewidth=1.0, color="tab:orange")
+    ax2.set_yscale("log")
+    ax2.set_ylabel("sampled p99 force error (log)", color="tab:orange")
+    ax1.grid(True, alpha=0.3)
+    if title:
+        ax1.set_title(title)
+    fig.savefig(filepath, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+
+
+def plot_scaling(results, filepath: str | Path, mode: str = "strong", title: str | None = None) -> None:
+    # results: rows with workers, speedup, efficiency, imbalance (see testing/bench.py scaling)
+    workers = [r["workers"] for r in results]
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(11, 4))
+    ax1.plot(workers, [r["speedup"] for r in results], marker="o", linewidth=1.5, label="measured")
+    ax1.plot(workers, workers, linestyle="--", color="gray", label="ideal")
+    ax1.set_xlabel("workers")
+    ax1.set_ylabel("scaled speedup" if mode == "weak" else "speedup")
+    ax1.legend()
+    ax2.plot(workers, [r["efficiency"] for r in results], marker="o", linewidth=1.5, label="efficiency")
+    ax2.plot(workers, [r["imbalance"] for r in results], marker="s", linewidth=1.0, label="load imbalance")
+    ax2.axhline(1.0, linestyle="--", color="gray")
+    ax2.set_xlabel("workers")
+    ax2.set_ylim(bottom=0.0)
+    ax2.legend()
+    for ax in (ax1, ax2):
+        ax.set_xscale("log", base=2)
+        ax.set_xticks(workers, [str(w) for w in workers])
+        ax.grid(True, alpha=0.3)
+    fig.suptitle(title or f"{mode.capitalize()} scaling")
+    fig.savefig(filepath, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+
+
 def save_stepc_outputs(sim, run_dir: Path, title_prefix: str | None = None) -> list[Path]:
     saved: list[Path] = []
     final_full = run_dir / "final_xy_full.png"
@@ -124,6 +257,10 @@ def save_stepc_outputs(sim, run_dir: Path, title_prefix: str | None = None) -> l
         energy_path = run_dir / "energy_drift.png"
         plot_energy_drift(sim.energy_drift, energy_path, title=f"{title_prefix} — Energy drift" if title_prefix else None)
         saved.append(energy_path)
+    if getattr(sim, "theta_history", None):
+        theta_path = run_dir / "theta_history.png"
+        plot_theta_history(sim.theta_history, theta_path, title=f"{title_prefix} — Adaptive theta" if title_prefix else None)
+        saved.append(theta_path)
     return saved
 
 
@@ -141,18 +278,9 @@ def save_animation(anim, out_path: str | Path, fps: int = 30):
     raise ValueError(f"Unsupported extension '{ext}'. Use .gif or .mp4")
 
 
-def animate_xy(
-    frames,
-    out_path: str | Path | None = None,
-    interval: int = 20,
-    title: str | None = None,
-    show: bool = True,
-    fps: int = 30,
-) -> Path | None:
-    if not frames:
-        raise ValueError("No frames recorded (try --animate and check frame_every).")
-    xy = np.array([[(p[0], p[1]) for p in frame] for frame in frames], dtype=float)
-    T, N, _ = xy.shape
+def draw_xy_scene(fig, first: np.ndarray, lim: float, title: str | None = None):
+    # axes + styled scatter for the xy animation; returns the scatter to update per frame
+    N = first.shape[0]
     if N <= 5:
         body_size = 250
     elif N <= 50:
@@ -161,8 +289,7 @@ def animate_xy(
         body_size = 25
     else:
         body_size = 10
-    lim = _robust_lim_from_frames(xy, percentile=99.0, padding=2.0)
-    fig, ax = plt.subplots(figsize=(6, 6))
+    ax = fig.add_subplot(111)
     ax.set_aspect("equal", adjustable="box")
     ax.set_xlim(-lim, lim)
     ax.set_ylim(-lim, lim)
@@ -171,10 +298,31 @@ def animate_xy(
     apply_space_style(ax, lim, hide_axes=True)
     if title:
         ax.title.set_color("white")
-    sc = ax.scatter(xy[0, :, 0], xy[0, :, 1], s=body_size, c=BODY_COLOR, alpha=1.0, linewidths=0, zorder=3)
+    return ax.scatter(first[:, 0], first[:, 1], s=body_size, c=BODY_COLOR, alpha=1.0, linewidths=0, zorder=3)
+
+
+def set_frame_xy(sc, pos: np.ndarray) -> None:
+    sc.set_offsets(pos[:, :2])
+
+
+def animate_xy(
+    frames,
+    out_path: str | Path | None = None,
+    interval: int = 20,
+    title: str | None = None,
+    show: bool = True,
+    fps: int = 30,
+) -> Path | None:
+    if len(frames) == 0:
+        raise ValueError("No frames recorded (try --animate and check frame_every).")
+    T = len(frames)
+    first = _frame_array(frames[0])
+    lim = _robust_lim_from_frames(_sample_frames(frames), percentile=99.0, padding=2.0)
+    fig = plt.figure(figsize=(6, 6))
+    sc = draw_xy_scene(fig, first, lim, title)
 
     def update(i: int):
-        sc.set_offsets(xy[i])
+        set_frame_xy(sc, _frame_array(frames[i]))
         return (sc,)
 
     anim = FuncAnimation(fig, update, frames=T, interval=interval, blit=True, repeat=False)
@@ -189,17 +337,15 @@ def animate_xy(
 
 
 def plot_frame_xyz(frame, filepath: str | Path, title: str | None = None) -> None:
-    xs = [p[0] for p in frame]
-    ys = [p[1] for p in frame]
-    zs = [p[2] for p in frame]
+    pos = _frame_array(frame)
+    xs, ys, zs = pos[:, 0], pos[:, 1], pos[:, 2]
     fig = plt.figure(figsize=(7, 6))
     ax = fig.add_subplot(111, projection="3d")
     fig.patch.set_facecolor("black")
     ax.set_facecolor("black")
     ax.scatter(xs, ys, zs, s=8, c="white", alpha=0.8, linewidths=0)
-    all_vals = xs + ys + zs
-    finite_vals = [v for v in all_vals if np.isfinite(v)]
-    if finite_vals:
+    finite_vals = pos[np.isfinite(pos)]
+    if finite_vals.size:
         r = np.percentile(np.abs(finite_vals), 99.0)
         r = r if r > 0 else 1.0
     else:
@@ -221,40 +367,85 @@ def plot_frame_xyz(frame, filepath: str | Path, title: str | None = None) -> Non
     plt.close(fig)
 
 
-def save_snapshots_xyz(sim, run_dir: Path, title_prefix: str | None = None) -> list[Path]:
+def save_snapshots_xyz(sim, run_dir: Path, title_prefix: str | None = None, frames=None) -> list[Path]:
+    # frames defaults to sim.frames; pass a TrajectoryReader to read from disk instead
     saved: list[Path] = []
-    if not sim.frames:
+    if frames is None:
+        frames = sim.frames
+    if len(frames) == 0:
         return saved
 
     # initial
     p0 = run_dir / "initial_xyz.png"
-    plot_frame_xyz(sim.frames[0], p0, title=f"{title_prefix} — Initial XYZ" if title_prefix else None)
+    plot_frame_xyz(frames[0], p0, title=f"{title_prefix} — Initial XYZ" if title_prefix else None)
     saved.append(p0)
 
     # final
     p1 = run_dir / "final_xyz.png"
-    plot_frame_xyz(sim.frames[-1], p1, title=f"{title_prefix} — Final XYZ" if title_prefix else None)
+    plot_frame_xyz(frames[-1], p1, title=f"{title_prefix} — Final XYZ" if title_prefix else None)
     saved.append(p1)
 
     return saved
 
 
-def animate_xyz(
-    frames,
-    out_path: str | Path | None = None,
-    interval: int = 30,
-    title: str | None = None,
-    show: bool = True,
-    fps: int = 30,
-):
-    if not frames:
-        raise ValueError("No frames recorded (try --animate / record_frames).")
-    xyz = np.array(frames, dtype=float)
-    T, N, _ = xyz.shape
-    x_all = xyz[..., 0].ravel()
-    y_all = xyz[..., 1].ravel()
-    z_all = xyz[..., 2].ravel()
-
+def lod_subset(pos: np.ndarray, max_points: int, masses=None, density_weight: float = 0.0, seed: int = 0):
+    """
+    Indices of at most max_points bodies to draw, chosen once from the first frame
+    and reused for every frame so the same bodies stay on screen; masses must be
+    those of the bodies in that frame.
+
+    Bodies are sampled without replacement with probability ~ mass * density^density_weight
+    (density = bodies in the same cell of a LOD_GRID^3 grid), so density_weight > 0
+    keeps more of the dense regions. Returns None when no subsampling is needed.
+    """
+    N = len(pos)
+    if N <= max_points:
+        return None
+    if masses is not None and len(masses) != N:
+        raise ValueError(f"Got {len(masses)} masses for a frame of {N} bodies")
+    w = np.ones(N) if masses is None else np.asarray(masses, dtype=float).copy()
+    w[~(w > 0)] = w[w > 0].min() if (w > 0).any() else 1.0  # massless bodies still get a chance
+
+    if density_weight > 0:
+        lo, hi = pos.min(axis=0), pos.max(axis=0)
+        cells = ((pos - lo) / np.maximum(hi - lo, 1e-300) * (LOD_GRID - 1)).astype(np.int64)
+        flat = (cells[:, 0] * LOD_GRID + cells[:, 1]) * LOD_GRID + cells[:, 2]
+        w *= np.bincount(flat, minlength=LOD_GRID ** 3)[flat] ** density_weight
+
+    # weighted sampling without replacement (Efraimidis-Spirakis keys)
+    rng = np.random.default_rng(seed)
+    keys = np.log(rng.random(N)) / w
+    return np.sort(np.argpartition(keys, N - max_points)[N - max_points:])
+
+
+def track_subset(subset, n: int, merge_events):
+    """
+    Follow a subset chosen on a frame of n bodies through the collision mergers in
+    merge_events (Simulation.merge_events). Returns {body count: indices}: every
+    merge pass shrinks the body count, so a frame's length tells which passes it has
+    seen. take_subset() accepts the result in place of a plain index array.
+    """
+    if subset is None or not merge_events:
+        return subset
+    tracked = {n: subset}
+    for _, events in groupby(merge_events, key=lambda e: e["step"]):
+        events = list(events)
+        n -= sum(len(e["members"]) - 1 for e in events)
+        subset = np.asarray(remap_indices(subset, events), dtype=np.int64)
+        tracked[n] = subset
+    return tracked
+
+
+def take_subset(pos: np.ndarray, subset) -> np.ndarray:
+    if subset is None:
+        return pos
+    if isinstance(subset, dict):
+        subset = subset[len(pos)]
+    return pos[subset]
+
+
+def xyz_lims(sample: np.ndarray):
+    # symmetric per-axis limits from a (M, 3) sample of positions
     def lims(v):
         finite = v[np.isfinite(v)]
         if finite.size == 0:
@@ -265,8 +456,13 @@ def animate_xyz(
         r *= 2.0
         return -r, r
 
-    xlim, ylim, zlim = lims(x_all), lims(y_all), lims(z_all)
-    fig = plt.figure(figsize=(7, 6))
+    return lims(sample[:, 0]), lims(sample[:, 1]), lims(sample[:, 2])
+
+
+def draw_xyz_scene(fig, first: np.ndarray, limits, title: str | None = None):
+    # 3D axes + scatter for the xyz animation; returns the scatter to update per frame
+    N = first.shape[0]
+    xlim, ylim, zlim = limits
     ax = fig.add_subplot(111, projection="3d")
     fig.patch.set_facecolor("black")
     ax.set_facecolor("black")
@@ -287,16 +483,49 @@ def animate_xyz(
             pass
     if title:
         ax.set_title(title, color="white")
-    sc = ax.scatter(
-        xyz[0, :, 0], xyz[0, :, 1], xyz[0, :, 2],
+    return ax.scatter(
+        first[:, 0], first[:, 1], first[:, 2],
         s=30 if N <= 5 else 12,
         c="white",
         alpha=1.0,
         linewidths=0,
     )
 
+
+def set_frame_xyz(sc, pos: np.ndarray) -> None:
+    sc._offsets3d = (pos[:, 0], pos[:, 1], pos[:, 2])
+
+
+def animate_xyz(
+    frames,
+    out_path: str | Path | None = None,
+    interval: int = 30,
+    title: str | None = None,
+    show: bool = True,
+    fps: int = 30,
+    max_points: int | None = None,
+    masses=None,
+    density_weight: float = 0.0,
+    merge_events=None,
+):
+    """
+    max_points: draw at most this many bodies, picked once with lod_subset()
+                (mass-weighted, optionally favouring dense regions via density_weight)
+    merge_events: the run's collision mergers, so the picked bodies are followed
+                  when mergers renumber them (see track_subset)
+    """
+    if len(frames) == 0:
+        raise ValueError("No frames recorded (try --animate / record_frames).")
+    T = len(frames)
+    first = _frame_array(frames[0])
+    subset = None
+    if max_points is not None:
+        subset = track_subset(lod_subset(first, max_points, masses, density_weight), len(first), merge_events)
+    fig = plt.figure(figsize=(7, 6))
+    sc = draw_xyz_scene(fig, take_subset(first, subset), xyz_lims(_sample_frames(frames)), title)
+
     def update(i):
-        sc._offsets3d = (xyz[i, :, 0], xyz[i, :, 1], xyz[i, :, 2])
+        set_frame_xyz(sc, take_subset(_frame_array(frames[i]), subset))
         return (sc,)
 
     anim = FuncAnimation(fig, update, frames=T, interval=interval, blit=False, repeat=False)
@@ -307,4 +536,41 @@ def animate_xyz(
         plt.show()
     else:
         plt.close(fig)
-    return saved
\ No newline at end of file
+    return saved
+
+
+def animate_density(
+    frames,
+    projection: str = "xy",
+    bins: int = DENSITY_BINS,
+    log: bool = True,
+    interval: int = 30,
+    title: str | None = None,
+    show: bool = True,
+):
+    # interactive density-map animation; cost per frame depends on bins, not on N
+    if len(frames) == 0:
+        raise ValueError("No frames recorded (try --animate / record_frames).")
+    T = len(frames)
+    idx = np.unique(np.linspace(0, T - 1, num=min(T, DENSITY_SAMPLE_FRAMES)).astype(int))
+    lim, vmax = density_scale([frames[i] for i in idx], projection, bins)
+
+    def image(i):
+        return density_rgb(density_image(project(_frame_array(frames[i]), projection), lim, bins), vmax, log)
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    fig.patch.set_facecolor("black")
+    ax.set_axis_off()
+    im = ax.imshow(image(0), extent=(-lim, lim, -lim, lim), interpolation="nearest")
+    if title:
+        ax.set_title(title, color="white")
+
+    def update(i):
+        im.set_data(image(i))
+        return (im,)
+
+    anim = FuncAnimation(fig, update, frames=T, interval=interval, blit=True, repeat=False)  # noqa: F841 (keep alive)
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
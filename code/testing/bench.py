@@ -0,0 +1,753 @@
+"""
+Benchmark runner.
+
+Every case (scene x solver x integrator x N) is run `warmup` times untimed and
+`repeat` times timed; results are written as JSON together with the machine
+metadata, and `compare` flags cases that got slower than a stored baseline.
+
+    python -m code.testing.bench list --suite quick
+    python -m code.testing.bench run --suite quick --out bench.json
+    python -m code.testing.bench compare baseline.json bench.json --threshold 0.10
+
+`pareto` measures force accuracy against cost: the reference accelerations come
+from direct summation (cached on disk per scene, N, seed, softening and a hash of
+the code that produces them) and every approximate solver configuration gets its
+per-body relative force-error distribution and time per force evaluation; the
+non-dominated points form the Pareto front.
+
+    python -m code.testing.bench pareto --n 2000 --grid theta=0.2,0.3,0.5,0.7,1.0
+
+`memory` runs every case in a fresh process twice: once for the peak RSS of a
+whole run, once under tracemalloc for the peak allocation of each phase (tree
+build, force evaluation, integration with precomputed forces, full step, frame
+recording). Both are reported per body, and a linear fit of peak RSS over N
+predicts the largest N for a memory size.
+
+    python -m code.testing.bench memory --ns 500 1000 2000 --node-gb 16
+
+`scaling` runs any solver that takes a `workers` parameter over 1..P workers, either
+at a fixed N (strong) or at a fixed N per worker (weak), and reports speedup,
+parallel efficiency and the load imbalance between the workers' busy times.
+
+    python -m code.testing.bench scaling --solver barneshut --mode strong --n 2000 --workers 1 2 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from code.nbody.autotune import machine_fingerprint
+from code.nbody.bodies import Body, SystemState, bodies_to_arrays
+from code.nbody.cache import SCENE_SOURCES, source_hash
+from code.nbody.physics import SofteningConfig, compute_accelerations_at, compute_relative_force_errors
+from code.nbody.engine import Simulation, SimulationConfig
+from code.nbody.integrators.euler import EulerIntegrator
+from code.nbody.integrators.leapfrog import LeapfrogIntegrator
+from code.nbody.solvers.direct import DirectSolver
+from code.nbody.solvers.barneshut import BarnesHutSolver
+from code.nbody import scenes
+
+
+RESULTS_VERSION = 1
+
+REFERENCE_DIR = Path(".nbody_cache") / "reference"
+
+# solver name -> class; pareto configurations are {"solver": name, "params": {...}}
+SOLVER_CLASSES = {"direct": DirectSolver, "barneshut": BarnesHutSolver}
+
+
+def make_random_bodies(N, seed=42, pos_scale=1.0, vel_scale=0.5, m_min=1e-3, m_max=1e-2):
+    random.seed(seed)
+    bodies = []
+    for _ in range(N):
+        bodies.append(
+            Body(
+                m=random.uniform(m_min, m_max),
+                x=random.uniform(-pos_scale, pos_scale),
+                y=random.uniform(-pos_scale, pos_scale),
+                z=random.uniform(-pos_scale, pos_scale),
+                vx=random.uniform(-vel_scale, vel_scale),
+                vy=random.uniform(-vel_scale, vel_scale),
+                vz=random.uniform(-vel_scale, vel_scale),
+            )
+        )
+    return bodies
+
+
+def make_bodies(scene: str, n: int, seed: int = 42):
+    # "random" is the uniform cube used by the old benchmark scripts; other names are scenes.py generators
+    if scene == "random":
+        return make_random_bodies(n, seed=seed)
+    return getattr(scenes, scene)(n=n, seed=seed)
+
+
+def make_solver(name: str, theta: float | None = None):
+    if name == "direct":
+        return DirectSolver()
+    return BarnesHutSolver(theta=theta)
+
+
+def make_integrator(name: str):
+    if name == "euler":
+        return EulerIntegrator()
+    return LeapfrogIntegrator()
+
+
+# Case registry
+
+CASES: dict[str, dict] = {}
+SUITES: dict[str, list[str]] = {}
+
+
+def case_name(case: dict) -> str:
+    solver = case["solver"] if case["theta"] is None else f"{case['solver']}{case['theta']}"
+    return f"{case['scene']}-{solver}-{case['integrator']}-N{case['n']}"
+
+
+def register(suite: str, scene: str, solver: str, integrator: str, n: int,
+             steps: int = 10, dt: float = 2e-3, softening: float = 1e-3, theta: float | None = None) -> dict:
+    case = {
+        "scene": scene,
+        "solver": solver,
+        "theta": theta if solver == "barneshut" else None,
+        "integrator": integrator,
+        "n": n,
+        "steps": steps,
+        "dt": dt,
+        "softening": softening,
+    }
+    name = case_name(case)
+    CASES[name] = case
+    SUITES.setdefault(suite, []).append(name)
+    return case
+
+
+def _register_defaults():
+    for suite, ns in (("quick", (100, 250)), ("full", (100, 250, 500, 1000, 2000))):
+        for n in ns:
+            for integrator in ("leapfrog", "euler"):
+                register(suite, "random", "direct", integrator, n)
+                for theta in (0.5, 0.7):
+                    register(suite, "random", "barneshut", integrator, n, theta=theta)
+            register(suite, "plummer", "barneshut", "leapfrog", n, theta=0.7, softening=0.02)
+
+
+_register_defaults()
+
+
+def select_cases(suite: str = "quick", match: str | None = None) -> list[dict]:
+    names = SUITES[suite] if suite != "all" else list(CASES)
+    if match:
+        names = [n for n in names if fnmatch.fnmatch(n, match)]
+    return [{"name": n, **CASES[n]} for n in names]
+
+
+# Running
+
+def machine_metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        **machine_fingerprint(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_case(case: dict, warmup: int = 1, repeat: int = 5) -> dict:
+    template = make_bodies(case["scene"], case["n"])
+    times = []
+    for i in range(warmup + repeat):
+        cfg = SimulationConfig(dt=case["dt"], timesteps=case["steps"], softening=case["softening"])
+        sim = Simulation(
+            bodies=[Body(*b.asTuple()) for b in template],
+            cfg=cfg,
+            integrator=make_integrator(case["integrator"]),
+            solver=make_solver(case["solver"], case["theta"]),
+        )
+        t0 = time.perf_counter()
+        sim.run()
+        if i >= warmup:
+            times.append(time.perf_counter() - t0)
+
+    return {
+        **case,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "per_step": statistics.median(times) / case["steps"],
+    }
+
+
+def run_suite(cases, warmup: int = 1, repeat: int = 5, out_path=None, log=print) -> dict:
+    results = []
+    for case in cases:
+        r = run_case(case, warmup, repeat)
+        results.append(r)
+        log(f"  {r['name']:<40} median {r['median'] * 1e3:9.2f} ms  (min {r['min'] * 1e3:.2f}, sd {r['stdev'] * 1e3:.2f})")
+
+    report = {"version": RESULTS_VERSION, "metadata": machine_metadata(),
+              "warmup": warmup, "repeat": repeat, "results": results}
+    if out_path is not None:
+        write_json(report, out_path)
+    return report
+
+
+def write_json(report: dict, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def load_results(path) -> dict:
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    if report.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {report.get('version')}")
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10, stat: str = "median") -> list[dict]:
+    """
+    One row per case present in both reports: ratio = current / baseline of `stat`.
+    regression is set when the ratio exceeds 1 + threshold.
+    """
+    base = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        if r["name"] not in base:
+            continue
+        b = base[r["name"]][stat]
+        ratio = r[stat] / b if b > 0 else float("inf")
+        rows.append({
+            "name": r["name"],
+            "baseline": b,
+            "current": r[stat],
+            "ratio": ratio,
+            "regression": ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+# Force accuracy vs cost
+
+def reference_code_hash() -> str:
+    # the scene generators and the direct kernel (nbody sources) plus the "random" scene defined here
+    payload = source_hash(SCENE_SOURCES) + inspect.getsource(make_random_bodies)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def reference_accelerations(scene: str, n: int, seed: int, softening: float, cache_dir=REFERENCE_DIR):
+    # (N, 3) direct-summation accelerations, computed once per (scene, n, seed, softening) and code version
+    path = Path(cache_dir) / f"{scene}-N{n}-seed{seed}-soft{softening:g}-{reference_code_hash()}.npy"
+    if path.exists():
+        return np.load(path)
+    m, pos, _ = bodies_to_arrays(make_bodies(scene, n, seed))
+    ref = compute_accelerations_at(pos, m, pos, softening)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, ref)
+    return ref
+
+
+def parse_grid(specs) -> dict:
+    # ["theta=0.3,0.5"] -> {"theta": [0.3, 0.5]}
+    grid = {}
+    for spec in specs or []:
+        knob, _, values = spec.partition("=")
+        grid[knob.strip()] = [json.loads(v) for v in values.split(",") if v.strip()]
+    return grid
+
+
+def solver_configs(solver: str, grid: dict) -> list[dict]:
+    knobs = sorted(grid)
+    return [{"solver": solver, "params": dict(zip(knobs, values))}
+            for values in itertools.product(*(grid[k] for k in knobs))]
+
+
+def pareto_front(points, cost: str = "time", error: str = "p99") -> list[int]:
+    # indices of points not dominated in (cost, error), both lower-is-better
+    order = sorted(range(len(points)), key=lambda i: (points[i][cost], points[i][error]))
+    front, best = [], float("inf")
+    for i in order:
+        if points[i][error] < best:
+            front.append(i)
+            best = points[i][error]
+    return front
+
+
+def run_pareto(configs, scene: str = "random", n: int = 1000, seed: int = 42, softening: float = 1e-3,
+               repeat: int = 3, error: str = "p99", log=print) -> dict:
+    bodies = make_bodies(scene, n, seed)
+    ref = reference_accelerations(scene, n, seed, softening).T
+    cfg = SofteningConfig(softening)
+
+    points = []
+    for config in configs:
+        solver = SOLVER_CLASSES[config["solver"]](**config["params"])
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            acc = solver.accelerations(bodies, cfg)
+            best = min(best, time.perf_counter() - t0)
+        errors = compute_relative_force_errors(acc, ref)
+        point = {
+            **config,
+            "time": best,
+            "median": float(np.median(errors)),
+            "p99": float(np.percentile(errors, 99)),
+            "max": float(errors.max()),
+        }
+        points.append(point)
+        log(f"  {config['solver']:<10} {json.dumps(config['params']):<24} {best * 1e3:9.2f} ms  "
+            f"median {point['median']:.2e}  p99 {point['p99']:.2e}  max {point['max']:.2e}")
+
+    front = set(pareto_front(points, error=error))
+    for i, point in enumerate(points):
+        point["pareto"] = i in front
+
+    return {
+        "version": RESULTS_VERSION,
+        "metadata": machine_metadata(),
+        "case": {"scene": scene, "n": n, "seed": seed, "softening": softening, "repeat": repeat, "error": error},
+        "results": points,
+    }
+
+
+def plot_pareto(report: dict, path):
+    import matplotlib.pyplot as plt
+
+    error = report["case"]["error"]
+    points = report["results"]
+    front = sorted((p for p in points if p["pareto"]), key=lambda p: p["time"])
+    fig, ax = plt.subplots(figsize=(7, 5))
+    ax.scatter([p["time"] * 1e3 for p in points], [max(p[error], 1e-16) for p in points], s=20, alpha=0.6)
+    ax.plot([p["time"] * 1e3 for p in front], [max(p[error], 1e-16) for p in front], marker="o", color="tab:red")
+    for p in front:
+        ax.annotate(json.dumps(p["params"]), (p["time"] * 1e3, max(p[error], 1e-16)), fontsize=7)
+    ax.set_yscale("log")
+    ax.set_xlabel("time per force evaluation (ms)")
+    ax.set_ylabel(f"{error} relative force error (log)")
+    ax.set_title(f"Force error vs cost, N={report['case']['n']}")
+    ax.grid(True, alpha=0.3)
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+# Memory footprint
+
+MEMORY_PHASES = ("bodies", "tree_build", "force", "integration", "full_step", "frame_recording")
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # KiB on Linux
+
+
+def _traced_peak(fn):
+    # (result, peak bytes allocated above the level at entry) while fn runs
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    return result, tracemalloc.get_traced_memory()[1] - base
+
+
+def _memory_sim(case: dict, record_frames: bool):
+    cfg = SimulationConfig(dt=case["dt"], timesteps=case["steps"], softening=case["softening"])
+    cfg.record_frames = record_frames
+    cfg.record_history = case["record_history"]
+    return Simulation(
+        bodies=make_bodies(case["scene"], case["n"]),
+        cfg=cfg,
+        integrator=make_integrator(case["integrator"]),
+        solver=make_solver(case["solver"], case["theta"]),
+    )
+
+
+def _integrate_only(case: dict, bodies, acc):
+    # the integrator's drift / kick loop with every force call answered by the precomputed
+    # acc, so no tree build or force evaluation is counted
+    cfg = SimulationConfig(dt=case["dt"], timesteps=case["steps"], softening=case["softening"])
+    integrator = make_integrator(case["integrator"])
+    accel_fn = lambda _: acc
+    state = integrator.initialize(SystemState(bodies), cfg, accel_fn)
+    for _ in range(case["steps"]):
+        state = integrator.step(state, cfg, accel_fn)
+    return state
+
+
+def _memory_child(conn, case: dict, mode: str):
+    # runs in a freshly spawned interpreter so ru_maxrss only covers this case
+    try:
+        if mode == "rss":
+            before = _max_rss_bytes()
+            _memory_sim(case, record_frames=True).run()
+            after = _max_rss_bytes()
+            conn.send({"rss_peak": after, "rss_base": before})
+            return
+
+        tracemalloc.start()
+        cfg = SofteningConfig(case["softening"])
+        peaks = {}
+        bodies, peaks["bodies"] = _traced_peak(lambda: make_bodies(case["scene"], case["n"]))
+        solver = make_solver(case["solver"], case["theta"])
+        if hasattr(solver, "build_tree"):
+            _, peaks["tree_build"] = _traced_peak(lambda: solver.build_tree(bodies))
+        acc, peaks["force"] = _traced_peak(lambda: solver.accelerations(bodies, cfg))
+        _, peaks["integration"] = _traced_peak(lambda: _integrate_only(case, bodies, acc))
+        # whole runs (trees, forces, integrator, diagnostics) without and with frames
+        _, peaks["full_step"] = _traced_peak(_memory_sim(case, record_frames=False).run)
+        _, with_frames = _traced_peak(_memory_sim(case, record_frames=True).run)
+        peaks["frame_recording"] = max(with_frames - peaks["full_step"], 0)
+        conn.send({"tracemalloc": peaks})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _in_fresh_process(case: dict, mode: str) -> dict:
+    ctx = get_context("spawn")
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_memory_child, args=(send_conn, case, mode))
+    proc.start()
+    send_conn.close()
+    try:
+        result = recv_conn.recv()
+    except EOFError:
+        result = {"error": f"worker exited with code {proc.exitcode}"}
+    proc.join()
+    return result
+
+
+def measure_memory(case: dict) -> dict:
+    n = case["n"]
+    row = {**case}
+    for mode in ("rss", "tracemalloc"):
+        result = _in_fresh_process(case, mode)
+        if "error" in result:
+            row["error"] = result["error"]
+            return row
+        row.update(result)
+
+    if row.get("rss_peak") is not None:
+        row["rss_delta"] = row["rss_peak"] - row["rss_base"]
+        row["rss_per_body"] = row["rss_delta"] / n
+    row["per_body"] = {phase: peak / n for phase, peak in row["tracemalloc"].items()}
+    return row
+
+
+def fit_memory(rows, node_bytes: float | None = None) -> dict:
+    """
+    Least-squares fit rss_peak ~ a + b * N per (solver, integrator);
+    max_n is the N at which the fit reaches node_bytes.
+    """
+    groups = {}
+    for r in rows:
+        if r.get("rss_peak") is not None:
+            groups.setdefault(f"{r['solver']}-{r['integrator']}", []).append(r)
+
+    fits = {}
+    for key, rs in groups.items():
+        if len({r["n"] for r in rs}) < 2:
+            continue
+        b, a = np.polyfit([r["n"] for r in rs], [r["rss_peak"] for r in rs], 1)
+        fit = {"base_bytes": float(a), "bytes_per_body": float(b)}
+        if node_bytes is not None and b > 0:
+            fit["max_n"] = int((node_bytes - a) / b)
+        fits[key] = fit
+    return fits
+
+
+def run_memory(cases, node_bytes: float | None = None, log=print) -> dict:
+    rows = []
+    for case in cases:
+        row = measure_memory(case)
+        rows.append(row)
+        if "error" in row:
+            log(f"  {row['name']:<40} error: {row['error']}")
+            continue
+        per_body = "  ".join(f"{p} {row['per_body'][p]:.0f}" for p in MEMORY_PHASES if p in row["per_body"])
+        rss = f"RSS +{row['rss_delta'] / 2**20:.1f} MiB ({row['rss_per_body']:.0f} B/body)" if "rss_delta" in row else "RSS n/a"
+        log(f"  {row['name']:<40} {rss}  tracemalloc B/body: {per_body}")
+
+    return {
+        "version": RESULTS_VERSION,
+        "metadata": machine_metadata(),
+        "results": rows,
+        "fits": fit_memory(rows, node_bytes),
+    }
+
+
+
+# Strong / weak scaling
+
+def accepts_workers(solver: str) -> bool:
+    return "workers" in inspect.signature(SOLVER_CLASSES[solver]).parameters
+
+
+def default_worker_counts() -> list[int]:
+    # 1, 2, 4, ... up to the number of cores (always at least 1 and 2)
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max(cores, 2):
+        counts.append(counts[-1] * 2)
+    if counts[-1] < cores:
+        counts.append(cores)
+    return counts
+
+
+def measure_scaling_point(solver: str, params: dict, workers: int, scene: str, n: int, seed: int = 42,
+                          steps: int = 3, dt: float = 2e-3, softening: float = 1e-3,
+                          integrator: str = "leapfrog", repeat: int = 3) -> dict:
+    # one untimed run starts the worker pool, then `repeat` timed runs share it
+    template = make_bodies(scene, n, seed)
+    engine = SOLVER_CLASSES[solver](**params, workers=workers)
+    times = []
+    try:
+        for i in range(repeat + 1):
+            if i == 1:
+                engine.worker_times = [0.0] * workers
+            cfg = SimulationConfig(dt=dt, timesteps=steps, softening=softening)
+            sim = Simulation(
+                bodies=[Body(*b.asTuple()) for b in template],
+                cfg=cfg,
+                integrator=make_integrator(integrator),
+                solver=engine,
+            )
+            t0 = time.perf_counter()
+            sim.run()
+            if i > 0:
+                times.append(time.perf_counter() - t0)
+    finally:
+        engine.close()
+
+    busy = engine.worker_times
+    row = {"workers": workers, "n": n, "times": times, "median": statistics.median(times)}
+    row["throughput"] = n * steps / row["median"]  # body-steps per second
+    if workers > 1 and any(busy):
+        # (slowest worker / average worker) - 1: 0 means perfectly balanced chunks
+        row["worker_busy"] = busy
+        row["imbalance"] = max(busy) / statistics.fmean(busy) - 1.0
+    else:
+        row["imbalance"] = 0.0
+    return row
+
+
+def run_scaling(solver: str, params: dict, mode: str, n: int, worker_counts, scene: str = "random",
+                seed: int = 42, steps: int = 3, repeat: int = 3, log=print) -> dict:
+    """
+    mode="strong": the same n for every worker count, speedup = T(1) / T(P).
+    mode="weak":   n bodies per worker (n * P in total), efficiency = T(1) / T(P);
+                   the reported speedup is the scaled one, P * T(1) / T(P).
+    """
+    if not accepts_workers(solver):
+        raise ValueError(f"Solver '{solver}' does not take a workers parameter")
+    worker_counts = sorted(set(worker_counts) | {1})
+
+    rows = []
+    for p in worker_counts:
+        size = n if mode == "strong" else n * p
+        row = measure_scaling_point(solver, params, p, scene, size, seed, steps=steps, repeat=repeat)
+        rows.append(row)
+
+    t1 = rows[0]["median"]
+    for row in rows:
+        p = row["workers"]
+        if mode == "strong":
+            row["speedup"] = t1 / row["median"]
+            row["efficiency"] = row["speedup"] / p
+        else:
+            row["efficiency"] = t1 / row["median"]
+            row["speedup"] = p * row["efficiency"]
+        log(f"  P={p:<3} N={row['n']:<7} {row['median'] * 1e3:9.2f} ms  speedup {row['speedup']:.2f}  "
+            f"efficiency {row['efficiency']:.0%}  imbalance {row['imbalance']:.1%}")
+
+    return {
+        "version": RESULTS_VERSION,
+        "metadata": machine_metadata(),
+        "case": {"solver": solver, "params": params, "mode": mode, "n": n, "scene": scene,
+                 "seed": seed, "steps": steps, "repeat": repeat},
+        "results": rows,
+    }
+
+
+# Command line
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="N-body benchmark runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = sub.add_parser("list", help="List registered cases")
+    list_parser.add_argument("--suite", choices=("quick", "full", "all"), default="all")
+    list_parser.add_argument("--match", default=None)
+
+    run_parser = sub.add_parser("run", help="Run a suite and write JSON results")
+    run_parser.add_argument("--suite", choices=("quick", "full", "all"), default="quick")
+    run_parser.add_argument("--match", default=None)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--out", default="bench.json")
+
+    compare_parser = sub.add_parser("compare", help="Compare results against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.add_argument("--stat", choices=("median", "min", "mean"), default="median")
+
+    pareto_parser = sub.add_parser("pareto", help="Force error vs time per evaluation against direct summation")
+    pareto_parser.add_argument("--scene", default="random")
+    pareto_parser.add_argument("--n", type=int, default=1000)
+    pareto_parser.add_argument("--seed", type=int, default=42)
+    pareto_parser.add_argument("--softening", type=float, default=1e-3)
+    pareto_parser.add_argument("--solver", choices=tuple(SOLVER_CLASSES), default="barneshut")
+    pareto_parser.add_argument("--grid", action="append", default=None)
+    pareto_parser.add_argument("--repeat", type=int, default=3)
+    pareto_parser.add_argument("--error", choices=("median", "p99", "max"), default="p99")
+    pareto_parser.add_argument("--out", default="pareto.json")
+    pareto_parser.add_argument("--plot", default=None)
+
+    memory_parser = sub.add_parser("memory", help="Peak RSS and per-phase tracemalloc peaks per body")
+    memory_parser.add_argument("--scene", default="random")
+    memory_parser.add_argument("--ns", nargs="+", type=int, default=[250, 500, 1000])
+    memory_parser.add_argument("--solvers", nargs="+", choices=tuple(SOLVER_CLASSES), default=["direct", "barneshut"])
+    memory_parser.add_argument("--integrators", nargs="+", choices=("euler", "leapfrog"), default=["leapfrog"])
+    memory_parser.add_argument("--theta", type=float, default=0.7)
+    memory_parser.add_argument("--steps", type=int, default=3)
+    memory_parser.add_argument("--record-history", action="store_true")
+    memory_parser.add_argument("--node-gb", type=float, default=None)
+    memory_parser.add_argument("--out", default="memory.json")
+
+    scaling_parser = sub.add_parser("scaling", help="Strong / weak scaling over worker counts")
+    scaling_parser.add_argument("--solver", choices=[s for s in SOLVER_CLASSES if accepts_workers(s)], default="barneshut")
+    scaling_parser.add_argument("--theta", type=float, default=0.7)
+    scaling_parser.add_argument("--mode", choices=("strong", "weak"), default="strong")
+    scaling_parser.add_argument("--scene", default="random")
+    scaling_parser.add_argument("--n", type=int, default=2000)
+    scaling_parser.add_argument("--seed", type=int, default=42)
+    scaling_parser.add_argument("--workers", nargs="+", type=int, default=None)
+    scaling_parser.add_argument("--steps", type=int, default=3)
+    scaling_parser.add_argument("--repeat", type=int, default=3)
+    scaling_parser.add_argument("--out", default="scaling.json")
+    scaling_parser.add_argument("--plot", default=None)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "list":
+        for case in select_cases(args.suite, args.match):
+            print(f"{case['name']:<40} steps={case['steps']} dt={case['dt']} softening={case['softening']}")
+        return 0
+
+    if args.command == "run":
+        cases = select_cases(args.suite, args.match)
+        print(f"Running {len(cases)} cases (warmup={args.warmup}, repeat={args.repeat})")
+        run_suite(cases, args.warmup, args.repeat, out_path=args.out)
+        print(f"\nResults written to {args.out}")
+        return 0
+
+    if args.command == "compare":
+        rows = compare(load_results(args.baseline), load_results(args.current), args.threshold, args.stat)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<40} {row['baseline'] * 1e3:9.2f} -> {row['current'] * 1e3:9.2f} ms  x{row['ratio']:.3f}  {flag}")
+        regressions = [r for r in rows if r["regression"]]
+        print(f"\n{len(rows)} cases compared, {len(regressions)} slower than +{args.threshold:.0%}")
+        return 1 if regressions else 0
+
+    if args.command == "pareto":
+        grid = parse_grid(args.grid)
+        if args.solver == "barneshut" and not grid:
+            grid = {"theta": [0.2, 0.3, 0.5, 0.7, 1.0]}
+        configs = solver_configs(args.solver, grid)
+        print(f"Pareto sweep: {len(configs)} configurations, {args.scene} N={args.n} seed={args.seed}")
+        report = run_pareto(configs, args.scene, args.n, args.seed, args.softening, args.repeat, args.error)
+        write_json(report, args.out)
+        print(f"\nPareto front ({args.error} error vs time):")
+        for p in sorted((p for p in report["results"] if p["pareto"]), key=lambda p: p["time"]):
+            print(f"  {json.dumps(p['params']):<24} {p['time'] * 1e3:9.2f} ms  {args.error} {p[args.error]:.2e}")
+        if args.plot:
+            plot_pareto(report, args.plot)
+            print(f"Plot written to {args.plot}")
+        print(f"Results written to {args.out}")
+        return 0
+
+    if args.command == "memory":
+        cases = []
+        for solver, integrator, n in itertools.product(args.solvers, args.integrators, args.ns):
+            case = {
+                "scene": args.scene,
+                "solver": solver,
+                "theta": args.theta if solver == "barneshut" else None,
+                "integrator": integrator,
+                "n": n,
+                "steps": args.steps,
+                "dt": 2e-3,
+                "softening": 1e-3,
+                "record_history": args.record_history,
+            }
+            cases.append({"name": case_name(case), **case})
+        node_bytes = args.node_gb * 2**30 if args.node_gb else None
+        print(f"Memory benchmark: {len(cases)} cases, {args.steps} steps each")
+        report = run_memory(cases, node_bytes)
+        write_json(report, args.out)
+        for key, fit in report["fits"].items():
+            line = f"  {key:<22} {fit['bytes_per_body']:.0f} B/body + {fit['base_bytes'] / 2**20:.1f} MiB"
+            if "max_n" in fit:
+                line += f"  -> max N ~ {fit['max_n']:,} in {args.node_gb:g} GiB"
+            print(line)
+        print(f"Results written to {args.out}")
+        return 0
+
+    if args.command == "scaling":
+        params = {"theta": args.theta} if args.solver == "barneshut" else {}
+        workers = args.workers or default_worker_counts()
+        print(f"{args.mode.capitalize()} scaling: {args.solver} {json.dumps(params)}, "
+              f"N={args.n}{' per worker' if args.mode == 'weak' else ''}, workers {workers}")
+        report = run_scaling(args.solver, params, args.mode, args.n, workers, args.scene, args.seed, args.steps, args.repeat)
+        write_json(report, args.out)
+        if args.plot:
+            from code.nbody.viz import plot_scaling
+            plot_scaling(report["results"], args.plot, args.mode, title=f"{args.mode.capitalize()} scaling, {args.solver} N={args.n}")
+            print(f"Plot written to {args.plot}")
+        print(f"Results written to {args.out}")
+        return 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,12 @@
 import time
-import random
 
 #generated using AI assistance
 
-from code.nbody.bodies import Body
 from code.nbody.engine import Simulation, SimulationConfig
 from code.nbody.integrators.leapfrog import LeapfrogIntegrator
 from code.nbody.solvers.barneshut import BarnesHutSolver
 from code.nbody.solvers.direct import DirectSolver
-
-
-def make_random_bodies(N, seed=42):
-    random.seed(seed)
-    bodies = []
-    for _ in range(N):
-        bodies.append(
-            Body(
-                m=random.uniform(1e-3, 1e-2),
-                x=random.uniform(-1, 1),
-                y=random.uniform(-1, 1),
-                z=random.uniform(-1, 1),
-                vx=random.uniform(-0.5, 0.5),
-                vy=random.uniform(-0.5, 0.5),
-                vz=random.uniform(-0.5, 0.5),
-            )
-        )
-    return bodies
+from code.testing.bench import make_random_bodies
 
 
 N = 1000
@@ -0,0 +1,52 @@
+import time
+
+from code.nbody import scenes
+from code.nbody.cache import ResultCache
+from code.nbody.engine import Simulation, SimulationConfig
+from code.nbody.integrators.leapfrog import LeapfrogIntegrator
+from code.nbody.solvers.adaptive import ThetaController
+from code.nbody.solvers.barneshut import BarnesHutSolver
+
+
+def _run(async_diagnostics, lag=0.0):
+    cfg = SimulationConfig(dt=2e-3, timesteps=12, softening=0.02)
+    cfg.enable_diagnostics = True
+    cfg.async_diagnostics = async_diagnostics
+    sim = Simulation(
+        bodies=scenes.plummer(n=64, seed=7),
+        cfg=cfg,
+        integrator=LeapfrogIntegrator(),
+        solver=BarnesHutSolver(theta=0.7),
+        theta_controller=ThetaController(target_error=0.5, max_energy_drift=1e-9, every=2, sample_size=8, seed=3),
+    )
+    if lag:
+        measure = sim._measure_diagnostics
+
+        def slow_measure(snapshot):
+            time.sleep(lag)  # keep the worker behind the stepping thread
+            return measure(snapshot)
+
+        sim._measure_diagnostics = slow_measure
+    sim.run()
+    return sim
+
+
+def test_async_diagnostics_do_not_change_the_theta_path():
+    sync = _run(False)
+    assert _run(True, lag=0.02).theta_history == sync.theta_history
+
+
+def test_result_cache_restores_the_theta_path(tmp_path):
+    sim = _run(False)
+    cache = ResultCache(tmp_path)
+    cache.store("key", sim)
+
+    cached = Simulation(
+        bodies=scenes.plummer(n=64, seed=7),
+        cfg=sim.cfg,
+        integrator=LeapfrogIntegrator(),
+        solver=BarnesHutSolver(theta=0.7),
+    )
+    assert cache.load("key", cached)
+    assert cached.theta_history == sim.theta_history
+    assert cached.solver.theta == sim.solver.theta != 0.7
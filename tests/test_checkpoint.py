@@ -0,0 +1,59 @@
+import json
+
+from code.nbody import scenes
+from code.nbody.checkpoint import load_checkpoint, save_checkpoint
+from code.nbody.engine import Simulation, SimulationConfig
+from code.nbody.integrators.leapfrog import LeapfrogIntegrator
+from code.nbody.solvers.adaptive import ThetaController
+from code.nbody.solvers.barneshut import BarnesHutSolver
+
+
+def _adaptive_sim(steps):
+    cfg = SimulationConfig(dt=2e-3, timesteps=steps, softening=0.02)
+    cfg.enable_diagnostics = True
+    return Simulation(
+        bodies=scenes.plummer(n=64, seed=7),
+        cfg=cfg,
+        integrator=LeapfrogIntegrator(),
+        solver=BarnesHutSolver(theta=0.7),
+        theta_controller=ThetaController(target_error=1e-3, max_energy_drift=1e-6, every=2, sample_size=8, seed=3),
+    )
+
+
+def test_resume_with_adaptive_theta_is_bit_identical(tmp_path):
+    full = _adaptive_sim(8)
+    full.run()
+
+    first = _adaptive_sim(8)
+    path = tmp_path / "checkpoint.npz"
+    for view in first.iter_steps():
+        if view.step == 4:
+            save_checkpoint(first, path)
+            break
+
+    resumed = load_checkpoint(path)
+    assert resumed.theta_controller is not None
+    resumed.run(resume=True)
+
+    assert resumed.step_count == full.step_count
+    assert resumed.theta_history == full.theta_history
+    assert resumed.solver.theta == full.solver.theta
+    assert [b.asTuple() for b in resumed.state.bodies] == [b.asTuple() for b in full.state.bodies]
+
+
+def test_checkpoint_keeps_merge_events(tmp_path):
+    cfg = SimulationConfig(dt=1e-3, timesteps=4, softening=0.02)
+    cfg.collision_radius = 0.5
+    sim = Simulation(
+        bodies=scenes.plummer(n=32, seed=1),
+        cfg=cfg,
+        integrator=LeapfrogIntegrator(),
+        solver=BarnesHutSolver(theta=0.7),
+    )
+    sim.run()
+    assert sim.merge_events
+
+    path = save_checkpoint(sim, tmp_path / "checkpoint.npz")
+    resumed = load_checkpoint(path)
+    assert resumed.merge_events == json.loads(json.dumps(sim.merge_events))
+    assert len(resumed.state.bodies) == len(sim.state.bodies)
@@ -0,0 +1,46 @@
+from code.nbody.bodies import Body
+from code.nbody.engine import SimulationConfig
+from code.nbody.solvers.barneshut import BarnesHutSolver
+from code.nbody.solvers.direct import DirectSolver
+from code.nbody.trees.octree import MAX_DEPTH, NeighborTree, build_octree
+
+
+def _bodies_with_duplicates():
+    bodies = [Body(1.0, 0.1 * i, 0.05 * i * i, -0.02 * i, 0.0, 0.0, 0.0) for i in range(6)]
+    bodies += [Body(0.5, 0.3, 0.2, 0.1, 0.0, 0.0, 0.0) for _ in range(3)]  # coincident
+    bodies.append(Body(0.5, 0.3, 0.2, 0.1 + 1e-300, 0.0, 0.0, 0.0))     # nearly coincident
+    return bodies
+
+
+def test_coincident_bodies_share_a_leaf():
+    bodies = _bodies_with_duplicates()
+    root = build_octree(bodies)
+    assert root.total_mass == sum(b.m for b in bodies)
+
+    leaves = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.children is None:
+            leaves.append(node)
+        else:
+            stack.extend(node.children)
+    assert max(leaf.depth for leaf in leaves) <= MAX_DEPTH
+    assert sorted(len(leaf.leaf_bodies()) for leaf in leaves)[-1] == 4
+    assert sum(len(leaf.leaf_bodies()) for leaf in leaves) == len(bodies)
+
+
+def test_coincident_bodies_forces_and_queries():
+    bodies = _bodies_with_duplicates()
+    cfg = SimulationConfig(dt=1e-3, timesteps=1, softening=0.05)
+    # theta = 0 opens every node, so Barnes-Hut must match the direct sum
+    bh = BarnesHutSolver(theta=0.0).accelerations(bodies, cfg)
+    direct = DirectSolver().accelerations(bodies, cfg)
+    for a, b in zip(bh, direct):
+        assert all(abs(x - y) <= 1e-9 * (1.0 + abs(y)) for x, y in zip(a, b))
+
+    tree = NeighborTree(bodies)
+    assert sorted(tree.query_radius([(0.3, 0.2, 0.1)], 1e-6)[0]) == [6, 7, 8, 9]
+    indices, distances = tree.query_knn([(0.3, 0.2, 0.1)], 4)
+    assert sorted(indices[0]) == [6, 7, 8, 9]
+    assert max(distances[0]) < 1e-12
@@ -0,0 +1,16 @@
+from code.nbody import scenes
+from code.nbody.engine import Simulation, SimulationConfig
+from code.nbody.integrators.leapfrog import LeapfrogIntegrator
+from code.nbody.solvers.barneshut import BarnesHutSolver
+
+
+def test_barnes_hut_workers_match_serial_and_close_with_the_run():
+    bodies = scenes.plummer(n=200, seed=1)
+    cfg = SimulationConfig(dt=1e-3, timesteps=2, softening=0.02)
+    serial = BarnesHutSolver(theta=0.6).accelerations(bodies, cfg)
+
+    solver = BarnesHutSolver(theta=0.6, workers=2)
+    sim = Simulation(bodies=bodies, cfg=cfg, integrator=LeapfrogIntegrator(), solver=solver)
+    assert solver.accelerations(bodies, cfg) == serial
+    sim.run()
+    assert solver._pool._pool is None and solver._pool._shared._shm is None